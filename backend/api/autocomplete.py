@@ -0,0 +1,204 @@
+import glob
+import mmap
+import os
+import struct
+import tempfile
+
+from django.conf import settings
+from rest_framework.response import Response
+
+from recipes.models import CatalogVersion, Ingredient
+from .catalog import INGREDIENTS_SCOPE
+from .validator import query_int
+
+MAGIC = b'ING1'
+HEADER = struct.Struct('<4sI')
+OFFSET = struct.Struct('<I')
+ID = struct.Struct('<Q')
+LENGTH = struct.Struct('<H')
+MAX_CANDIDATES = 1000
+
+_loaded = {}
+
+
+def fold(text):
+    """Приводит строку к виду для поиска: регистр и ё не важны."""
+    return text.strip().casefold().replace('ё', 'е')
+
+
+def _pack_str(value):
+    raw = value.encode()
+    return LENGTH.pack(len(raw)) + raw
+
+
+def build_index(path, rows):
+    """
+    Записывает отсортированный индекс в файл.
+
+    Формат: заголовок, таблица смещений записей и сами записи
+    (ключ, id, название, единица измерения). Файл подменяется атомарно.
+    """
+    records = sorted(
+        (fold(name).encode(), pk, name, unit) for pk, name, unit in rows)
+    offsets, chunks, position = [], [], 0
+    for key, pk, name, unit in records:
+        chunk = (LENGTH.pack(len(key)) + key + ID.pack(pk)
+                 + _pack_str(name) + _pack_str(unit))
+        offsets.append(position)
+        chunks.append(chunk)
+        position += len(chunk)
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as index_file:
+        index_file.write(HEADER.pack(MAGIC, len(records)))
+        for offset in offsets:
+            index_file.write(OFFSET.pack(offset))
+        for chunk in chunks:
+            index_file.write(chunk)
+    os.replace(tmp_path, path)
+
+
+class PrefixIndex:
+    """
+    Индекс префиксного поиска в отображенном в память файле.
+
+    Страницы файла общие для всех процессов, которые его открыли,
+    поиск идет бинарным поиском без обращения к базе.
+    """
+
+    def __init__(self, path):
+        """Открываем файл и проверяем заголовок."""
+        with open(path, 'rb') as index_file:
+            self.buffer = mmap.mmap(index_file.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f'Неверный формат индекса: {path}')
+        self.data_start = HEADER.size + OFFSET.size * self.count
+
+    def _position(self, index):
+        return self.data_start + OFFSET.unpack_from(
+            self.buffer, HEADER.size + OFFSET.size * index)[0]
+
+    def _key(self, index):
+        position = self._position(index)
+        (length,) = LENGTH.unpack_from(self.buffer, position)
+        start = position + LENGTH.size
+        return self.buffer[start:start + length]
+
+    def _str(self, position):
+        (length,) = LENGTH.unpack_from(self.buffer, position)
+        start = position + LENGTH.size
+        return self.buffer[start:start + length].decode(), start + length
+
+    def _record(self, index):
+        position = self._position(index)
+        (length,) = LENGTH.unpack_from(self.buffer, position)
+        position += LENGTH.size + length
+        (pk,) = ID.unpack_from(self.buffer, position)
+        name, position = self._str(position + ID.size)
+        unit, _ = self._str(position)
+        return {'id': pk, 'name': name, 'measurement_unit': unit}
+
+    def _lower_bound(self, key):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def search(self, prefix, limit):
+        """
+        Ищет записи, начинающиеся с префикса.
+
+        Точное совпадение идет первым, дальше более короткие названия
+        и алфавитный порядок.
+        """
+        key = fold(prefix).encode()
+        start = self._lower_bound(key)
+        end = min(self._lower_bound(key + b'\xff'), start + MAX_CANDIDATES)
+        candidates = sorted(
+            range(start, end),
+            key=lambda index: (self._key(index) != key,
+                               len(self._key(index)), index))
+        return [self._record(index) for index in candidates[:limit]]
+
+
+def index_path(version):
+    """Путь к файлу индекса для версии ингредиентов."""
+    return os.path.join(settings.AUTOCOMPLETE_INDEX_DIR,
+                        f'ingredients-{version}.idx')
+
+
+def remove_stale_indexes(path):
+    """
+    Удаляет файлы старых версий индекса.
+
+    Кроме текущего оставляем самый свежий из остальных: его еще
+    могут открывать воркеры, которые не успели увидеть новую версию.
+    """
+    pattern = os.path.join(settings.AUTOCOMPLETE_INDEX_DIR,
+                           'ingredients-*.idx')
+    others = []
+    for other in glob.glob(pattern):
+        try:
+            if other != path:
+                others.append((os.path.getmtime(other), other))
+        except FileNotFoundError:
+            continue
+    for _, other in sorted(others)[:-1]:
+        try:
+            os.remove(other)
+        except FileNotFoundError:
+            pass
+
+
+def get_index():
+    """
+    Индекс для текущей версии ингредиентов.
+
+    Версия берется из базы, поэтому все воркеры видят одну и ту же
+    независимо от кэша. Файл строится один раз на версию,
+    каждый процесс только отображает его в память.
+    """
+    path = index_path(CatalogVersion.objects.current(Ingredient))
+    loaded = _loaded.get(INGREDIENTS_SCOPE)
+    if loaded is not None and loaded[0] == path:
+        return loaded[1]
+    try:
+        index = PrefixIndex(path)
+    except FileNotFoundError:
+        os.makedirs(settings.AUTOCOMPLETE_INDEX_DIR, exist_ok=True)
+        build_index(path, Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit').iterator())
+        index = PrefixIndex(path)
+        remove_stale_indexes(path)
+    _loaded[INGREDIENTS_SCOPE] = (path, index)
+    return index
+
+
+class IngredientAutocompleteMixin:
+    """Отвечает на поиск ингредиентов по префиксу из индекса в памяти."""
+
+    autocomplete_params = ('name', 'search')
+    limit_query_param = 'limit'
+
+    def get_autocomplete_limit(self, request):
+        try:
+            return query_int(
+                request.query_params[self.limit_query_param],
+                cutoff=settings.INGREDIENT_AUTOCOMPLETE_MAX_LIMIT,
+            )
+        except (KeyError, ValueError):
+            return settings.INGREDIENT_AUTOCOMPLETE_LIMIT
+
+    def list(self, request, *args, **kwargs):
+        for param in self.autocomplete_params:
+            prefix = request.query_params.get(param)
+            if prefix:
+                return Response(get_index().search(
+                    prefix, self.get_autocomplete_limit(request)))
+        return super().list(request, *args, **kwargs)
@@ -0,0 +1,60 @@
+from django.db import transaction
+
+CREATED = 'created'
+EXISTS = 'exists'
+DELETED = 'deleted'
+MISSING = 'missing'
+NOT_FOUND = 'not_found'
+FORBIDDEN = 'forbidden'
+
+
+def unique_ids(ids):
+    """Id без повторов в исходном порядке."""
+    return list(dict.fromkeys(ids))
+
+
+def bulk_link(model, owner_field, owner, target_field, ids, valid_ids,
+              on_change=None):
+    """
+    Создает связи владельца с набором объектов одним bulk_create.
+
+    valid_ids уже проверены на существование. Возвращает статус
+    по каждому id и вызывает on_change со списком созданных связей.
+    """
+    target_key = f'{target_field}_id'
+    with transaction.atomic():
+        existing = set(model.objects.filter(**{
+            owner_field: owner, f'{target_key}__in': valid_ids,
+        }).values_list(target_key, flat=True))
+        created = [pk for pk in ids if pk in valid_ids and pk not in existing]
+        model.objects.bulk_create(
+            [model(**{owner_field: owner, target_key: pk}) for pk in created],
+            ignore_conflicts=True,
+        )
+        if on_change is not None and created:
+            on_change(created)
+    statuses = dict.fromkeys(existing, EXISTS)
+    statuses.update(dict.fromkeys(created, CREATED))
+    return [{'id': pk, 'status': statuses.get(pk, NOT_FOUND)} for pk in ids]
+
+
+def bulk_unlink(model, owner_field, owner, target_field, ids, valid_ids,
+                on_change=None):
+    """
+    Удаляет связи владельца с набором объектов одним DELETE.
+
+    Возвращает статус по каждому id и вызывает on_change
+    со списком удаленных связей.
+    """
+    target_key = f'{target_field}_id'
+    with transaction.atomic():
+        links = model.objects.filter(**{
+            owner_field: owner, f'{target_key}__in': valid_ids,
+        })
+        deleted = list(links.values_list(target_key, flat=True))
+        links.delete()
+        if on_change is not None and deleted:
+            on_change(deleted)
+    statuses = dict.fromkeys(valid_ids, MISSING)
+    statuses.update(dict.fromkeys(deleted, DELETED))
+    return [{'id': pk, 'status': statuses.get(pk, NOT_FOUND)} for pk in ids]
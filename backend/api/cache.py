@@ -0,0 +1,81 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+RECIPES_SCOPE = 'recipes'
+
+
+def get_cache():
+    """Кэш для ответов API, алиас задается RESPONSE_CACHE_ALIAS."""
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def generation_key(scope):
+    """Ключ счетчика поколений области кэша."""
+    return f'generation:{scope}'
+
+
+def get_generation(scope):
+    """Текущее поколение данных области кэша."""
+    return get_cache().get_or_set(generation_key(scope), 1, None)
+
+
+def bump_generation(scope):
+    """Сдвигает поколение, делая недействительными все ключи области."""
+    cache = get_cache()
+    key = generation_key(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+
+def normalized_query(request):
+    """Строка запроса с отсортированными параметрами и значениями."""
+    return urlencode(sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+    ))
+
+
+def response_cache_key(scope, request):
+    """Ключ ответа: поколение области и хэш нормализованного адреса."""
+    url = request.build_absolute_uri(request.path)
+    digest = hashlib.md5(
+        f'{url}?{normalized_query(request)}'.encode()).hexdigest()
+    return f'response:{scope}:{get_generation(scope)}:{digest}'
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Кэширует ответы list и retrieve для анонимных пользователей.
+
+    Ключ зависит от адреса и нормализованной строки запроса,
+    а сбрасывается сменой поколения области cache_scope.
+    """
+
+    cache_scope = RECIPES_SCOPE
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        timeout = settings.RESPONSE_CACHE_TIMEOUT
+        if request.user.is_authenticated or not timeout:
+            return handler(request, *args, **kwargs)
+        key = response_cache_key(self.cache_scope, request)
+        data = get_cache().get(key)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            get_cache().set(key, response.data, timeout)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request,
+                                    *args, **kwargs)
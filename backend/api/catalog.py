@@ -0,0 +1,100 @@
+import hashlib
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+from recipes.models import CatalogVersion, Tag
+from .cache import get_cache
+
+TAGS_SCOPE = 'tags'
+INGREDIENTS_SCOPE = 'ingredients'
+
+_local_snapshots = {}
+_tag_bits = {}
+
+
+class CatalogSnapshot:
+    """Готовый JSON справочника и его ETag."""
+
+    def __init__(self, content):
+        """Считаем ETag по содержимому снимка."""
+        self.content = content
+        self.etag = f'"{hashlib.sha1(content).hexdigest()}"'
+
+    def matches(self, request):
+        """Совпадает ли снимок с If-None-Match клиента."""
+        header = request.META.get('HTTP_IF_NONE_MATCH', '')
+        return self.etag in {tag.strip() for tag in header.split(',')}
+
+
+def build_snapshot(queryset, serializer_class):
+    """Сериализует весь справочник в байты один раз."""
+    data = serializer_class(queryset, many=True).data
+    return CatalogSnapshot(JSONRenderer().render(data))
+
+
+def get_snapshot(scope, queryset, serializer_class):
+    """
+    Снимок справочника для текущей версии его данных.
+
+    Версию читаем из базы, она одна на все процессы, даже
+    если кэш у каждого свой. Снимок ищем в памяти процесса,
+    затем в кэше, и только потом собираем из базы.
+    """
+    version = CatalogVersion.objects.current(queryset.model)
+    key = f'catalog:{scope}:{version}'
+    snapshot = _local_snapshots.get(scope)
+    if snapshot is not None and snapshot[0] == key:
+        return snapshot[1]
+    content = get_cache().get(key)
+    if content is None:
+        snapshot = build_snapshot(queryset, serializer_class)
+        get_cache().set(key, snapshot.content, None)
+    else:
+        snapshot = CatalogSnapshot(content)
+    _local_snapshots[scope] = (key, snapshot)
+    return snapshot
+
+
+def get_tag_bits():
+    """
+    Словарь slug тэга -> бит маски.
+
+    Строится в памяти процесса один раз на версию тэгов в базе.
+    """
+    version = CatalogVersion.objects.current(Tag)
+    if _tag_bits.get('version') != version:
+        _tag_bits['bits'] = dict(Tag.objects.values_list('slug', 'bit'))
+        _tag_bits['version'] = version
+    return _tag_bits['bits']
+
+
+def snapshot_response(request, snapshot):
+    """Ответ 304 при совпадении ETag, иначе готовый JSON."""
+    if snapshot.matches(request):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(snapshot.content,
+                                content_type='application/json')
+    response['ETag'] = snapshot.etag
+    response['Cache-Control'] = 'no-cache'
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
+class CatalogSnapshotMixin:
+    """
+    Отдает нефильтрованный список справочника из готового снимка.
+
+    Запросы с параметрами фильтрации идут обычным путем.
+    """
+
+    catalog_scope = None
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params:
+            return super().list(request, *args, **kwargs)
+        snapshot = get_snapshot(self.catalog_scope, self.get_queryset(),
+                                self.get_serializer_class())
+        return snapshot_response(request, snapshot)
@@ -0,0 +1,65 @@
+import heapq
+from collections import namedtuple
+from operator import attrgetter
+
+from django.db.models import Prefetch
+
+from recipes.models import FeedItem, Recipe, Subscription
+from .pagination import KeysetPagination
+
+FeedSource = namedtuple('FeedSource', ('queryset', 'pk_field', 'recipe_of'))
+
+
+def feed_sources(user):
+    """
+    Источники ленты пользователя.
+
+    Основной - его записи FeedItem, это проход по одному индексу.
+    Рецепты авторов с огромным числом подписчиков не рассылаются
+    и читаются напрямую из рецептов.
+    """
+    recipes = Recipe.objects.for_viewer(user)
+    sources = [FeedSource(
+        FeedItem.objects.filter(subscriber=user).prefetch_related(
+            Prefetch('recipe', queryset=recipes)),
+        'recipe_id',
+        attrgetter('recipe'),
+    )]
+    celebrities = FeedItem.objects.celebrity_author_ids()
+    if celebrities:
+        authors = list(Subscription.objects.filter(
+            subscriber=user, author_id__in=celebrities,
+        ).values_list('author_id', flat=True))
+        if authors:
+            sources.append(FeedSource(
+                recipes.filter(author_id__in=authors), 'pk', None))
+    return sources
+
+
+class FeedPagination(KeysetPagination):
+    """
+    Ключевая пагинация ленты по нескольким источникам.
+
+    Каждый источник читается от общего курсора не больше чем
+    на страницу, потом потоки сливаются по (дата, id) рецепта.
+    """
+
+    def paginate_sources(self, sources, request):
+        page_size = self.start(request)
+        streams = []
+        for source in sources:
+            items = self.keyset_filter(
+                source.queryset, pk_field=source.pk_field)[:page_size + 1]
+            if source.recipe_of is not None:
+                items = map(source.recipe_of, items)
+            streams.append(items)
+        page, seen = [], set()
+        for recipe in heapq.merge(*streams, key=attrgetter('date', 'pk'),
+                                  reverse=not self.reverse):
+            if recipe.pk in seen:
+                continue
+            seen.add(recipe.pk)
+            page.append(recipe)
+            if len(page) > page_size:
+                break
+        return self.set_page(page, page_size)
@@ -0,0 +1,61 @@
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+class RecipeImageUploadField(Base64ImageField):
+    """
+    Картинка рецепта строкой base64 или файлом из multipart.
+
+    Загруженный файл не декодируется целиком: Pillow читает
+    только заголовок, чтобы проверить формат и размеры.
+    Имя файла, как и для base64, генерируется заново.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, UploadedFile):
+            return super().to_internal_value(data)
+        upload = serializers.FileField.to_internal_value(self, data)
+        try:
+            with Image.open(upload) as image:
+                image_format = (image.format or '').lower()
+        except (OSError, Image.DecompressionBombError):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        finally:
+            upload.seek(0)
+        if image_format not in self.ALLOWED_TYPES:
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+        upload.name = f'{self.get_file_name(upload)}.{image_format}'
+        return upload
+
+
+class RecipeImageField(serializers.ReadOnlyField):
+    """
+    Ссылка на вариант картинки рецепта.
+
+    Размер можно переопределить ключом image_variant в контексте.
+    Пока варианты не готовы, отдается исходный файл,
+    а при fallback=False пустое значение.
+    """
+
+    def __init__(self, variant, extension='jpg', fallback=True, **kwargs):
+        """Запоминаем размер, формат и поведение без вариантов."""
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+        self.variant = variant
+        self.extension = extension
+        self.fallback = fallback
+
+    def to_representation(self, recipe):
+        variant = self.context.get('image_variant', self.variant)
+        url = recipe.image_variant_url(variant, self.extension)
+        if url is None:
+            if not self.fallback or not recipe.image:
+                return None
+            url = recipe.image.url
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
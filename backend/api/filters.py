@@ -1,18 +1,63 @@
+from django import forms
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Ingredient, Recipe
+from .catalog import get_tag_bits
+
+POPULAR_ORDERING = 'popular'
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+
+
+class SlugsField(forms.MultipleChoiceField):
+    """Список slug без проверки по справочнику, ее делает фильтр."""
+
+    def valid_value(self, value):
+        return True
+
+
+class SlugsFilter(filters.MultipleChoiceFilter):
+    """Фильтр по нескольким значениям ?tags=a&tags=b."""
+
+    field_class = SlugsField
 
 
 class FilterForRecipe(FilterSet):
     """Фильтер-класс для рецептов."""
 
-    tags = filters.ModelMultipleChoiceFilter(queryset=Tag.objects.all(),
-                                             field_name='tags__slug',
-                                             to_field_name='slug')
+    tags = SlugsFilter(method='filter_tags')
+    tags_match = filters.ChoiceFilter(
+        choices=((MATCH_ANY, 'Любой из тэгов'), (MATCH_ALL, 'Все тэги')),
+        method='filter_tags_match')
 
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=((POPULAR_ORDERING, 'Сначала популярные'),),
+        method='filter_ordering')
+
+    def filter_tags(self, queryset, name, value):
+        """
+        Фильтр по тэгам через маску тэгов рецепта.
+
+        Любой из тэгов или все сразу, в зависимости от tags_match.
+        Неизвестные slug в режиме all дают пустой результат.
+        """
+        match_all = self.form.cleaned_data.get('tags_match') == MATCH_ALL
+        bits = get_tag_bits()
+        known = [bits[slug] for slug in value if slug in bits]
+        if not known or (match_all and len(known) < len(set(value))):
+            return queryset.none()
+        mask = 0
+        for bit in known:
+            mask |= 1 << bit
+        return queryset.with_tags(mask, match_all)
+
+    def filter_tags_match(self, queryset, name, value):
+        """Режим сравнения тэгов, применяется в filter_tags."""
+        return queryset
 
     def filter_is_favorited(self, queryset, name, value):
         """Фильтр для избранного."""
@@ -26,9 +71,22 @@ class FilterForRecipe(FilterSet):
             return queryset.filter(cart__user=self.request.user)
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск по рецептам."""
+        value = value.strip()
+        if not value:
+            return queryset
+        return queryset.search(value)
+
+    def filter_ordering(self, queryset, name, value):
+        """Сортировка по счетчику избранного, она идет по индексу."""
+        if value == POPULAR_ORDERING:
+            return queryset.order_by('-favorites_count', '-date', '-id')
+        return queryset
+
     class Meta:
         model = Recipe
-        fields = ('author', 'tags')
+        fields = ('author', 'tags', 'tags_match')
 
 
 class ChangSearchForName(FilterSet):
@@ -0,0 +1,283 @@
+import base64
+import io
+import json
+import math
+import random
+import statistics
+import time
+from collections import Counter, defaultdict
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from django.db import connections
+from django.urls import reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, Tag
+from .probes import ProbeClient
+from .querystats import track_queries
+
+PROFILES = {
+    'guest': {
+        'recipes-list': 5,
+        'recipes-detail': 3,
+        'ingredients-autocomplete': 2,
+    },
+    'reader': {
+        'recipes-list': 4,
+        'recipes-detail': 3,
+        'subscriptions': 1,
+        'favorite-toggle': 2,
+        'cart-toggle': 2,
+        'shopping-list': 1,
+        'ingredients-autocomplete': 1,
+    },
+    'cook': {
+        'recipes-list': 2,
+        'recipes-detail': 1,
+        'ingredients-autocomplete': 3,
+        'recipe-create': 1,
+        'recipe-update': 2,
+    },
+}
+SAMPLE_SIZE = 1000
+
+
+def parse_mix(value):
+    """Разбирает смесь профилей вида guest=30,reader=50,cook=20."""
+    mix = {}
+    for part in value.split(','):
+        name, _, share = part.partition('=')
+        name = name.strip()
+        if name not in PROFILES:
+            raise ValueError(f'Неизвестный профиль: {name}.')
+        mix[name] = float(share or 1)
+    if sum(mix.values()) <= 0:
+        raise ValueError('Доли профилей должны быть больше нуля.')
+    return mix
+
+
+def assign_profiles(mix, concurrency):
+    """Профиль каждого из concurrency воркеров по долям смеси."""
+    total = sum(mix.values())
+    profiles = []
+    for index in range(concurrency):
+        point, cumulative = (index + 0.5) / concurrency * total, 0
+        for name, share in mix.items():
+            cumulative += share
+            if point < cumulative:
+                break
+        profiles.append(name)
+    return profiles
+
+
+def tiny_image():
+    """Картинка рецепта в base64, как ее шлет фронтенд."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), (200, 120, 40)).save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+class Samples:
+    """Случайные id и строки из базы, по которым ходят сценарии."""
+
+    def __init__(self, rng):
+        """Берем по SAMPLE_SIZE последних рецептов и ингредиентов."""
+        self.recipe_ids = list(Recipe.objects.order_by(
+            '-date', '-id').values_list('id', flat=True)[:SAMPLE_SIZE])
+        self.tags = list(Tag.objects.values_list('id', 'slug'))
+        names = list(Ingredient.objects.values_list(
+            'id', 'name')[:SAMPLE_SIZE])
+        self.ingredient_ids = [pk for pk, _ in names]
+        self.prefixes = sorted({name[:2] for _, name in names if name})
+        self.image = tiny_image()
+        rng.shuffle(self.recipe_ids)
+
+
+class InProcessSession:
+    """Запросы через тестовый клиент Django с подсчетом запросов к базе."""
+
+    def __init__(self, user):
+        """Клиент от имени пользователя или анонимный."""
+        self.client = ProbeClient(user)
+
+    def send(self, method, path, data=None):
+        """Возвращает (статус, тело ответа, число запросов к базе)."""
+        with track_queries() as stats:
+            response = getattr(self.client, method.lower())(
+                path, data, format='json')
+            content = (b''.join(response.streaming_content)
+                       if response.streaming else response.content)
+        return response.status_code, content, stats.count
+
+    def close(self):
+        connections.close_all()
+
+
+class HTTPSession:
+    """
+    Запросы к запущенному серверу по HTTP.
+
+    Число запросов к базе берется из заголовка X-DB-Queries,
+    если на сервере включен QUERY_STATS_HEADERS.
+    """
+
+    def __init__(self, user, base_url):
+        """Токен пользователя берем из той же базы, что у сервера."""
+        self.base_url = base_url.rstrip('/')
+        self.headers = {'Content-Type': 'application/json'}
+        if user is not None:
+            token, _ = Token.objects.get_or_create(user=user)
+            self.headers['Authorization'] = f'Token {token.key}'
+
+    def send(self, method, path, data=None):
+        """Возвращает (статус, тело ответа, число запросов к базе)."""
+        body = json.dumps(data).encode() if data is not None else None
+        request = Request(self.base_url + path, body, self.headers,
+                          method=method)
+        try:
+            with urlopen(request) as response:
+                status, content = response.status, response.read()
+                headers = response.headers
+        except HTTPError as error:
+            status, content, headers = error.code, error.read(), error.headers
+        queries = headers.get('X-DB-Queries')
+        return status, content, int(queries) if queries else None
+
+    def close(self):
+        connections.close_all()
+
+
+class Worker:
+    """Один виртуальный пользователь: профиль, состояние и сценарии."""
+
+    def __init__(self, profile, session, samples, seed):
+        """Сценарии профиля выбираются по весам своим генератором."""
+        self.session = session
+        self.samples = samples
+        self.rng = random.Random(seed)
+        self.names = list(PROFILES[profile])
+        self.weights = list(PROFILES[profile].values())
+        self.favorites, self.cart, self.own_recipes = set(), set(), []
+        self.results = defaultdict(list)
+
+    def request(self, name, method, path, data=None):
+        start = time.perf_counter()
+        try:
+            status, content, queries = self.session.send(method, path, data)
+        except Exception:
+            status, content, queries = 0, b'', None
+        self.results[name].append(
+            (time.perf_counter() - start, status, queries))
+        return status, content
+
+    def recipe_id(self):
+        return self.rng.choice(self.samples.recipe_ids)
+
+    def recipe_payload(self):
+        ingredients = self.rng.sample(
+            self.samples.ingredient_ids,
+            min(3, len(self.samples.ingredient_ids)))
+        return {
+            'name': f'Нагрузочный рецепт {self.rng.randrange(10 ** 6)}',
+            'text': 'Смешать и подавать.',
+            'cooking_time': self.rng.randint(5, 120),
+            'image': self.samples.image,
+            'tags': [self.rng.choice(self.samples.tags)[0]],
+            'ingredients': [{'id': pk, 'amount': self.rng.randint(1, 500)}
+                            for pk in ingredients],
+        }
+
+    def recipes_list(self):
+        slugs = self.rng.sample(self.samples.tags, self.rng.randint(
+            1, min(2, len(self.samples.tags))))
+        query = urlencode([('tags', slug) for _, slug in slugs])
+        self.request('recipes-list', 'GET',
+                     f'{reverse("api:recipes-list")}?{query}')
+
+    def recipes_detail(self):
+        self.request('recipes-detail', 'GET', reverse(
+            'api:recipes-detail', args=(self.recipe_id(),)))
+
+    def ingredients_autocomplete(self):
+        prefix = self.rng.choice(self.samples.prefixes)
+        self.request('ingredients-autocomplete', 'GET',
+                     f'{reverse("api:ingredients-list")}?'
+                     f'{urlencode({"name": prefix})}')
+
+    def subscriptions(self):
+        self.request('subscriptions', 'GET',
+                     reverse('api:users-subscriptions'))
+
+    def toggle(self, name, url_name, chosen):
+        pk = self.recipe_id()
+        method = 'DELETE' if pk in chosen else 'POST'
+        status, _ = self.request(name, method,
+                                 reverse(url_name, args=(pk,)))
+        if status < 300:
+            chosen.symmetric_difference_update((pk,))
+
+    def favorite_toggle(self):
+        self.toggle('favorite-toggle', 'api:recipes-favorite',
+                    self.favorites)
+
+    def cart_toggle(self):
+        self.toggle('cart-toggle', 'api:recipes-shopping-cart', self.cart)
+
+    def shopping_list(self):
+        self.request('shopping-list', 'GET',
+                     reverse('api:recipes-download-shopping-cart'))
+
+    def recipe_create(self):
+        status, content = self.request(
+            'recipe-create', 'POST', reverse('api:recipes-list'),
+            self.recipe_payload())
+        if status == 201:
+            self.own_recipes.append(json.loads(content)['id'])
+
+    def recipe_update(self):
+        if not self.own_recipes:
+            return self.recipe_create()
+        self.request('recipe-update', 'PATCH', reverse(
+            'api:recipes-detail', args=(self.rng.choice(self.own_recipes),)),
+            self.recipe_payload())
+
+    def run(self, deadline, budget):
+        """Выполняет сценарии до deadline или пока не кончится budget."""
+        try:
+            while time.monotonic() < deadline and next(budget) > 0:
+                name = self.rng.choices(self.names, self.weights)[0]
+                getattr(self, name.replace('-', '_'))()
+        finally:
+            self.session.close()
+        return self.results
+
+
+def percentile(values, share):
+    """Перцентиль отсортированного списка, ближайший ранг."""
+    return values[max(0, math.ceil(share / 100 * len(values)) - 1)]
+
+
+def summarize(samples, elapsed):
+    """Сводка по сценарию: задержки в мс, пропускная способность, запросы."""
+    latencies = sorted(latency * 1000 for latency, _, _ in samples)
+    queries = [count for _, _, count in samples if count is not None]
+    statuses = Counter(status for _, status, _ in samples)
+    return {
+        'requests': len(samples),
+        'errors': sum(count for status, count in statuses.items()
+                      if status == 0 or status >= 500),
+        'rps': round(len(samples) / elapsed, 2),
+        'p50': round(percentile(latencies, 50), 2),
+        'p95': round(percentile(latencies, 95), 2),
+        'p99': round(percentile(latencies, 99), 2),
+        'mean': round(statistics.fmean(latencies), 2),
+        'queries_avg': (round(statistics.fmean(queries), 2)
+                        if queries else None),
+        'queries_max': max(queries) if queries else None,
+        'statuses': {str(status): count
+                     for status, count in sorted(statuses.items())},
+    }
@@ -1,7 +1,340 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from constants import MAX_PAGE_SIZE
+from .validator import query_int
+
+INVALID_CURSOR_MESSAGE = 'Неверный курсор.'
+
+
+def encode_cursor(date, pk, reverse=False):
+    """Упаковывает позицию (дата, id) в непрозрачную строку."""
+    position = {'d': date.isoformat(), 'i': pk}
+    if reverse:
+        position['r'] = 1
+    return base64.urlsafe_b64encode(
+        json.dumps(position, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Распаковывает курсор в позицию (дата, id, обратное направление)."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        date = parse_datetime(position['d'])
+        pk = int(position['i'])
+        reverse = bool(position.get('r'))
+    except (TypeError, ValueError, KeyError, AttributeError):
+        raise NotFound(INVALID_CURSOR_MESSAGE)
+    if date is None:
+        raise NotFound(INVALID_CURSOR_MESSAGE)
+    return date, pk, reverse
+
+
+def count_queryset(queryset):
+    """
+    Запрос для подсчета: только id, без сортировки.
+
+    Аннотации выдачи (отметки избранного и корзины) в него не попадают,
+    COUNT(*) не считает их подзапросы для каждой строки.
+    """
+    return queryset.order_by().values('pk')
+
+
+class ExactCount:
+    """Точный подсчет: обычный COUNT(*) на каждый запрос."""
+
+    def count(self, queryset):
+        """Возвращает пару (количество, точное ли оно)."""
+        return count_queryset(queryset).count(), True
+
+
+class CachedCount(ExactCount):
+    """
+    Точный подсчет с коротким кэшем.
+
+    Ключ строится по SQL отфильтрованного запроса без сортировки
+    и аннотаций, поэтому одинаковые наборы фильтров делят одно значение.
+    Значение из кэша могло устареть и отдается как неточное.
+    """
+
+    key_prefix = 'pagination-rows'
+
+    def get_cache_key(self, queryset):
+        sql, params = count_queryset(queryset).query.sql_with_params()
+        digest = hashlib.md5(
+            f'{queryset.db}:{sql}:{params!r}'.encode()).hexdigest()
+        return f'{self.key_prefix}:{digest}'
+
+    def count(self, queryset):
+        if queryset.query.is_empty():
+            return 0, True
+        key = self.get_cache_key(queryset)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, False
+        count, _ = super().count(queryset)
+        cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count, True
+
+
+class EstimatedCount(CachedCount):
+    """
+    Оценка планировщика PostgreSQL для больших выборок.
+
+    Если планировщик ожидает больше строк, чем порог из настроек,
+    возвращается его оценка, иначе точный кэшированный подсчет.
+    """
+
+    def estimate(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql' or queryset.query.is_empty():
+            return None
+        sql, params = count_queryset(queryset).query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def count(self, queryset):
+        estimate = self.estimate(queryset)
+        if (estimate is not None
+                and estimate >= settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD):
+            return estimate, False
+        return super().count(queryset)
+
+
+def get_count_strategy():
+    """Стратегия подсчета из настройки PAGINATION_COUNT_STRATEGY."""
+    return import_string(settings.PAGINATION_COUNT_STRATEGY)()
+
+
+class CountedPage(Page):
+    """Страница, которая знает о следующей без общего количества."""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        """Есть ли следующая страница, решает лишняя строка выборки."""
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class CountingPaginator(Paginator):
+    """
+    Пагинатор Django, считающий объекты через стратегию подсчета.
+
+    Количество только показывается клиенту: страница нарезается
+    без него, поэтому устаревший или оценочный подсчет
+    не обрезает настоящие результаты.
+    """
+
+    def __init__(self, *args, count_strategy=None, **kwargs):
+        """Принимает стратегию подсчета, по умолчанию из настроек."""
+        super().__init__(*args, **kwargs)
+        self.count_strategy = count_strategy or get_count_strategy()
+        self.count_is_exact = True
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return len(self.object_list)
+        count, self.count_is_exact = self.count_strategy.count(
+            self.object_list)
+        return count
+
+    @cached_property
+    def last_page(self):
+        """Номер последней страницы по точному подсчету для page=last."""
+        count = self.count
+        if not self.count_is_exact:
+            count, _ = ExactCount().count(self.object_list)
+        return max(1, -(-count // self.per_page))
+
+    def validate_number(self, number):
+        """Номер страницы без сверки с количеством объектов."""
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        return number
+
+    def page(self, number):
+        """Страница из per_page + 1 строк, лишняя говорит о следующей."""
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(_('That page contains no results'))
+        return CountedPage(rows[:self.per_page], number, self,
+                           len(rows) > self.per_page)
 
 
 class UserPagination(PageNumberPagination):
     """Принимает параметр лимит вместо значения по-умолчанию."""
 
     page_size_query_param = 'limit'
+    django_paginator_class = CountingPaginator
+
+    def get_page_number(self, request, paginator):
+        page_number = request.query_params.get(self.page_query_param, 1)
+        if page_number in self.last_page_strings:
+            return paginator.last_page
+        return page_number
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_is_exact', self.page.paginator.count_is_exact),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу (дата, id).
+
+    Не считает COUNT(*) и не делает OFFSET, поэтому время ответа
+    не зависит от глубины страницы.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = MAX_PAGE_SIZE
+    date_field = 'date'
+
+    def get_page_size(self, request):
+        try:
+            return query_int(
+                request.query_params[self.page_size_query_param],
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def start(self, request):
+        """Читает курсор и размер страницы, возвращает размер."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.cursor = request.query_params.get(self.cursor_query_param)
+        self.position = decode_cursor(self.cursor) if self.cursor else None
+        self.reverse = bool(self.position and self.position[2])
+        return self.get_page_size(request)
+
+    def keyset_filter(self, queryset, date_field=None, pk_field='pk'):
+        """Отбирает записи после позиции курсора и сортирует их."""
+        date_field = date_field or self.date_field
+        lookup = 'gt' if self.reverse else 'lt'
+        if self.position is not None:
+            date, pk, _ = self.position
+            queryset = queryset.filter(
+                Q(**{f'{date_field}__{lookup}': date})
+                | Q(**{date_field: date, f'{pk_field}__{lookup}': pk}))
+        if self.reverse:
+            return queryset.order_by(date_field, pk_field)
+        return queryset.order_by(f'-{date_field}', f'-{pk_field}')
+
+    def set_page(self, page, page_size):
+        """Запоминает страницу из page_size + 1 записей в порядке выдачи."""
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        if self.reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, bool(self.cursor)
+        self.page = page
+        return page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.start(request)
+        return self.set_page(
+            list(self.keyset_filter(queryset)[:page_size + 1]), page_size)
+
+    def _cursor_link(self, obj, reverse):
+        cursor = encode_cursor(getattr(obj, self.date_field), obj.pk,
+                               reverse)
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   cursor)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self._cursor_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self._cursor_link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class RecipePagination(UserPagination):
+    """
+    Пагинация рецептов.
+
+    По умолчанию постраничная, с параметром pagination=cursor
+    или при переданном курсоре переключается на KeysetPagination.
+    Курсор идет по дате, поэтому сортировка по популярности
+    и поиск, отсортированный по релевантности, всегда постраничные.
+    """
+
+    mode_query_param = 'pagination'
+    own_ordering_query_params = ('ordering', 'search')
+    keyset_class = KeysetPagination
+
+    def use_keyset(self, request):
+        if any(request.query_params.get(param)
+               for param in self.own_ordering_query_params):
+            return False
+        return (self.keyset_class.cursor_query_param in request.query_params
+                or request.query_params.get(self.mode_query_param)
+                == 'cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
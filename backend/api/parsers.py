@@ -0,0 +1,43 @@
+import json
+
+from django.utils.datastructures import MultiValueDict
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+
+class JSONFieldsMultiPartParser(MultiPartParser):
+    """
+    multipart/form-data, где вложенные поля переданы строкой JSON.
+
+    Файлы остаются потоковыми загрузками Django, все поля вместе
+    с файлами собираются в обычный словарь, как после JSONParser.
+    """
+
+    json_fields = ('ingredients', 'tags')
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parsed = super().parse(stream, media_type, parser_context)
+        data = {}
+        for key, values in parsed.data.lists():
+            if key not in self.json_fields:
+                data[key] = values[-1]
+            elif len(values) > 1:
+                data[key] = values
+            else:
+                data[key] = self.json_value(key, values[0])
+        data.update(parsed.files.items())
+        return DataAndFiles(data, MultiValueDict())
+
+    def json_value(self, key, value):
+        """
+        Список или объект из строки JSON.
+
+        Одно значение повторяемого поля формы, например tags=1,
+        тоже становится списком из одного элемента.
+        """
+        if not value.lstrip().startswith(('[', '{')):
+            return [value]
+        try:
+            return json.loads(value)
+        except ValueError as error:
+            raise ParseError(f'Поле {key} должно быть JSON: {error}')
@@ -0,0 +1,79 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models import Count
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag, User
+
+Samples = namedtuple('Samples', 'user author recipe tag ingredient')
+
+
+def get_samples(user_id=None):
+    """
+    Объекты из базы для проверочных запросов или None, если база пуста.
+
+    По умолчанию запросы идут от пользователя с наибольшим числом
+    подписок, автором берется автор с наибольшим числом рецептов.
+    """
+    users = User.objects.all()
+    if user_id is not None:
+        users = users.filter(pk=user_id)
+    samples = Samples(
+        user=users.annotate(
+            following_count=Count('follower')
+        ).order_by('-following_count', 'pk').first(),
+        author=User.objects.order_by('-recipes_count', 'pk').first(),
+        recipe=Recipe.objects.first(),
+        tag=Tag.objects.first(),
+        ingredient=Ingredient.objects.first(),
+    )
+    if None in samples:
+        return None
+    return samples
+
+
+def endpoint_urls(samples):
+    """Адреса основных GET-запросов API."""
+    recipes = reverse('api:recipes-list')
+    return (
+        recipes,
+        f'{recipes}?pagination=cursor',
+        f'{recipes}?ordering=popular',
+        f'{recipes}?author={samples.author.pk}',
+        f'{recipes}?tags={samples.tag.slug}',
+        f'{recipes}?is_favorited=1',
+        f'{recipes}?is_in_shopping_cart=1',
+        reverse('api:recipes-detail', args=(samples.recipe.pk,)),
+        reverse('api:recipes-feed'),
+        reverse('api:recipes-download-shopping-cart'),
+        reverse('api:users-subscriptions'),
+        reverse('api:users-detail', args=(samples.author.pk,)),
+    )
+
+
+def allowed_host():
+    """Имя хоста, которое пропустит проверка ALLOWED_HOSTS."""
+    for host in settings.ALLOWED_HOSTS:
+        if host == '*':
+            return 'testserver'
+        return host.lstrip('.')
+    return 'localhost'
+
+
+class ProbeClient(APIClient):
+    """
+    Клиент API внутри процесса от имени пользователя.
+
+    Без пользователя запросы идут анонимно.
+    """
+
+    def __init__(self, user=None, **defaults):
+        """Авторизуем клиента токеном, как настоящий фронтенд."""
+        defaults.setdefault('HTTP_HOST', allowed_host())
+        super().__init__(**defaults)
+        if user is not None:
+            token, _ = Token.objects.get_or_create(user=user)
+            self.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
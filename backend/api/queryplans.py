@@ -0,0 +1,111 @@
+import json
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from constants import QUERY_PLAN_MIN_ROWS
+
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+SQL_ALIAS = re.compile(r'(?:FROM|JOIN) "(\w+)" (?:AS )?"?(\w+)"?')
+
+# (таблица, шаблон SQL, причина) для неизбежных полных сканирований.
+SEQ_SCAN_EXEMPTIONS = ()
+
+
+def postgresql_seq_scans(cursor, sql, params):
+    """Таблицы, которые PostgreSQL читает последовательным сканированием."""
+    cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes, tables = [plan[0]['Plan']], set()
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan':
+            tables.add(node['Relation Name'])
+        nodes.extend(node.get('Plans', ()))
+    return tables
+
+
+def sqlite_seq_scans(cursor, sql, params):
+    """
+    Таблицы, которые SQLite читает полным сканированием без индекса.
+
+    В плане SQLite пишет псевдоним таблицы, если он есть,
+    поэтому псевдонимы подзапросов Django (U0, T3) переводим в имена.
+    """
+    aliases = dict(
+        (alias, table) for table, alias in SQL_ALIAS.findall(sql))
+    cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+    return {aliases.get(match.group(1), match.group(1))
+            for *_, detail in cursor.fetchall()
+            for match in (SQLITE_SCAN.match(detail),) if match}
+
+
+SEQ_SCANS = {
+    'postgresql': postgresql_seq_scans,
+    'sqlite': sqlite_seq_scans,
+}
+
+
+def exemption(table, sql):
+    """Причина, по которой полное сканирование таблицы допустимо, или None."""
+    for exempt_table, pattern, reason in SEQ_SCAN_EXEMPTIONS:
+        if table == exempt_table and pattern.search(sql):
+            return reason
+    return None
+
+
+def captured_selects(client, url):
+    """Ответ на GET-запрос и SELECT-запросы к базе, сделанные для него."""
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    return response, [(query['sql'], None)
+                      for query in context.captured_queries
+                      if query['sql'].lstrip().upper().startswith('SELECT')]
+
+
+class PlanAudit:
+    """
+    Поиск полных сканирований больших таблиц в планах запросов.
+
+    Таблица считается большой с min_rows строк, сканирования
+    из SEQ_SCAN_EXEMPTIONS не считаются ошибкой.
+    """
+
+    def __init__(self, min_rows=QUERY_PLAN_MIN_ROWS):
+        """Выбираем разбор плана под текущую базу."""
+        if connection.vendor not in SEQ_SCANS:
+            raise ImproperlyConfigured(
+                f'Планы запросов {connection.vendor} не поддерживаются.')
+        self.seq_scans = SEQ_SCANS[connection.vendor]
+        self.min_rows = min_rows
+        self.rows = {}
+
+    def table_rows(self, cursor, table):
+        if table not in self.rows:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+            self.rows[table] = cursor.fetchone()[0]
+        return self.rows[table]
+
+    def check(self, sql, params=None):
+        """
+        Полные сканирования больших таблиц в плане запроса.
+
+        Возвращает (недопустимые таблицы, [(таблица, причина)]
+        для допустимых по SEQ_SCAN_EXEMPTIONS).
+        """
+        problems, exempt = [], []
+        with connection.cursor() as cursor:
+            for table in sorted(self.seq_scans(cursor, sql, params)):
+                if self.table_rows(cursor, table) < self.min_rows:
+                    continue
+                reason = exemption(table, sql)
+                if reason is None:
+                    problems.append(table)
+                else:
+                    exempt.append((table, reason))
+        return problems, exempt
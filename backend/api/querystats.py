@@ -0,0 +1,123 @@
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """
+    Обертка выполнения запросов к базе.
+
+    Считает запросы, их суммарное время и повторы одного и того же SQL
+    с разными параметрами: повторы - главный признак N+1.
+    """
+
+    def __init__(self):
+        """Начинаем с нуля."""
+        self.count = 0
+        self.time = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.monotonic() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        """Сколько запросов повторяют уже выполненный SQL."""
+        return sum(count - 1 for count in self.statements.values())
+
+    def most_repeated(self):
+        """Самый часто повторенный SQL и число его выполнений."""
+        if not self.statements:
+            return None, 0
+        return self.statements.most_common(1)[0]
+
+
+@contextmanager
+def track_queries():
+    """Собирает QueryStats по всем соединениям с базой внутри блока."""
+    stats = QueryStats()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        yield stats
+
+
+def get_budget(method, url_name):
+    """Бюджет запросов из QUERY_BUDGETS по ключу 'МЕТОД имя-адреса'."""
+    return settings.QUERY_BUDGETS.get(f'{method} {url_name}')
+
+
+@contextmanager
+def assert_query_budget(method, url_name, budget=None):
+    """
+    Проверяет, что запросы блока укладываются в бюджет адреса.
+
+    Бюджет берется из QUERY_BUDGETS, если не передан явно.
+    При превышении AssertionError называет самый частый SQL.
+    """
+    if budget is None:
+        budget = get_budget(method, url_name)
+    if budget is None:
+        raise AssertionError(
+            f'Бюджет {method} {url_name} не задан в QUERY_BUDGETS.')
+    with track_queries() as stats:
+        yield stats
+    if stats.count > budget:
+        sql, repeats = stats.most_repeated()
+        raise AssertionError(
+            f'{method} {url_name}: {stats.count} запросов при бюджете '
+            f'{budget}, чаще всего ({repeats} раз): {sql}')
+
+
+class QueryStatsMiddleware:
+    """
+    Статистика запросов к базе на каждый HTTP-запрос.
+
+    QUERY_STATS_HEADERS добавляет заголовки X-DB-Queries, X-DB-Time
+    и X-DB-Duplicates, QUERY_STATS_LOG пишет статистику в лог
+    и предупреждает о превышении бюджета из QUERY_BUDGETS.
+    """
+
+    def __init__(self, get_response):
+        """Без включенных заголовков или лога middleware отключается."""
+        if not (settings.QUERY_STATS_HEADERS or settings.QUERY_STATS_LOG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with track_queries() as stats:
+            response = self.get_response(request)
+        if settings.QUERY_STATS_HEADERS:
+            response['X-DB-Queries'] = stats.count
+            response['X-DB-Time'] = f'{stats.time * 1000:.1f}'
+            response['X-DB-Duplicates'] = stats.duplicates
+        if settings.QUERY_STATS_LOG:
+            self.log(request, stats)
+        return response
+
+    def log(self, request, stats):
+        match = request.resolver_match
+        url_name = match.url_name if match else None
+        budget = get_budget(request.method, url_name)
+        if budget is not None and stats.count > budget:
+            sql, repeats = stats.most_repeated()
+            logger.warning(
+                '%s %s: %d запросов при бюджете %d, чаще всего (%d раз): %s',
+                request.method, url_name, stats.count, budget, repeats, sql)
+            return
+        logger.info('%s %s: %d запросов, %.1f мс, повторов %d',
+                    request.method, url_name or request.path, stats.count,
+                    stats.time * 1000, stats.duplicates)
@@ -1,26 +1,41 @@
-from django.shortcuts import get_object_or_404
+from collections import Counter
+
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import IntegerField, SerializerMethodField
 from rest_framework.validators import UniqueTogetherValidator
 
-from constants import LESS_THEN_MINIMUM_INGREDIENTS
-from recipes.models import (Cart, Favorite, Ingredient, IngredientsOfRecipe,
-                            Recipe, Subscription, Tag, User)
+from constants import LESS_THEN_MINIMUM_INGREDIENTS, MAX_BULK_ITEMS
+from recipes.models import (Cart, CartIngredient, Favorite, Ingredient,
+                            IngredientsOfRecipe, Recipe, Subscription, Tag,
+                            User)
+from recipes.tasks import fan_out_recipe, submit
+from .fields import RecipeImageField, RecipeImageUploadField
+from .validator import query_int
+from .viewer import get_viewer_state
+
+
+class ViewerStateMixin:
+    """Доступ к состоянию текущего пользователя из контекста."""
+
+    @property
+    def viewer(self):
+        return (self.context.get('viewer')
+                or get_viewer_state(self.context.get('request')))
 
 
-class DjoserUserSerializer(UserSerializer):
+class DjoserUserSerializer(ViewerStateMixin, UserSerializer):
     """Переделаный из joser сериализатор пользователя."""
 
     is_subscribed = SerializerMethodField(read_only=True)
 
     def get_is_subscribed(self, obj):
         """Получение значения подписки пользователя на автора."""
-        subscriber = self.context.get('request').user
-        return (subscriber.is_authenticated
-                and obj.following.filter(subscriber=subscriber).exists())
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return self.viewer.is_subscribed(obj)
 
     class Meta:
         model = User
@@ -81,7 +96,7 @@ class IngredientsOfRecipeSerializer(serializers.ModelSerializer):
         ]
 
 
-class RecipesSerializer(serializers.ModelSerializer):
+class RecipesSerializer(ViewerStateMixin, serializers.ModelSerializer):
     """Сериализатор рецептов."""
 
     is_favorited = SerializerMethodField(read_only=True)
@@ -93,23 +108,26 @@ class RecipesSerializer(serializers.ModelSerializer):
         many=True,
         source='ingredients_in_recipe',
     )
+    image = RecipeImageField('card')
+    image_webp = RecipeImageField('card', 'webp', fallback=False)
 
     def get_is_favorited(self, obj):
         """Получаем значение, добавлен ли рецепт избранное."""
-        user = self.context.get('request').user
-        return user.is_authenticated and user.favorites.filter(
-            recipe=obj).exists()
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return self.viewer.is_favorited(obj)
 
     def get_is_in_shopping_cart(self, obj):
         """Получаем значение, добавлен ли рецепт в корзину."""
-        user = self.context.get('request').user
-        return user.is_authenticated and user.cart.filter(recipe=obj).exists()
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return self.viewer.is_in_shopping_cart(obj)
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart', 'name',
-                  'image', 'text', 'cooking_time')
+                  'image', 'image_webp', 'text', 'cooking_time')
 
 
 class PostIngredientsOfRecipeSerializer(serializers.ModelSerializer):
@@ -129,9 +147,8 @@ class PostIngredientsOfRecipeSerializer(serializers.ModelSerializer):
 class PostRecipesSerializer(serializers.ModelSerializer):
     """Сериализатор рецптов запроса POST."""
 
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True)
-    image = Base64ImageField()
+    tags = serializers.ListField(child=IntegerField(min_value=1))
+    image = RecipeImageUploadField()
     author = DjoserUserSerializer(read_only=True)
     ingredients = PostIngredientsOfRecipeSerializer(many=True)
 
@@ -140,33 +157,50 @@ class PostRecipesSerializer(serializers.ModelSerializer):
         fields = ('id', 'author', 'ingredients', 'tags', 'image',
                   'name', 'text', 'cooking_time')
 
-    def validate(self, attrs):
-        """Валидация создания и изменения."""
-        ingredients = self.initial_data.get('ingredients')
-        ingredients_list = []
+    @staticmethod
+    def id_errors(ids, existing_ids, not_found_message):
+        """Ошибки по всем id сразу: повторы и отсутствующие в базе."""
+        counts = Counter(ids)
+        errors = [{'id': pk, 'ошибка': 'Не должен повторяться'}
+                  for pk, count in counts.items() if count > 1]
+        errors += [{'id': pk, 'ошибка': not_found_message}
+                   for pk in counts if pk not in existing_ids]
+        return errors
+
+    def validate_ingredients(self, ingredients):
+        """Проверка всех ингредиентов одним запросом."""
         if not ingredients:
-            raise serializers.ValidationError({
-                'ingredients': 'Нужен хоть один ингридиент для рецепта'})
-        for ingredient in ingredients:
-
-            value = get_object_or_404(Ingredient, id=ingredient['id'])
-            if int(ingredient['amount']) < LESS_THEN_MINIMUM_INGREDIENTS:
-                raise ValidationError({'ошибка': 'не верно '
-                                                 'указано количество'})
-            if value in ingredients_list:
-                raise ValidationError({'ошибка': 'Ингредиенты не должны '
-                                                 'дублироваться'})
-            ingredients_list.append(value)
-
-        tags = self.initial_data.get('tags')
-        tags_list = []
+            raise ValidationError('Нужен хоть один ингридиент для рецепта')
+        ids = [item['id'] for item in ingredients]
+        errors = self.id_errors(
+            ids,
+            set(Ingredient.objects.filter(id__in=ids).order_by().values_list(
+                'id', flat=True)),
+            'Ингредиент не найден',
+        )
+        errors += [{'id': item['id'], 'ошибка': 'не верно указано количество'}
+                   for item in ingredients
+                   if item['amount'] < LESS_THEN_MINIMUM_INGREDIENTS]
+        if errors:
+            raise ValidationError(errors)
+        return ingredients
+
+    def validate_tags(self, tags):
+        """Проверка всех тэгов одним запросом, возвращает объекты Tag."""
         if not tags:
-            raise ValidationError({'ошибка': 'Поле ингредиенты не заполнено'})
-        for tag in tags:
-            if tag in tags_list:
-                raise ValidationError({'ошибка': 'Тэг не должен повторяться'})
-            tags_list.append(tag)
+            raise ValidationError('Нужен хоть один тэг для рецепта')
+        tags_by_id = Tag.objects.in_bulk(tags)
+        errors = self.id_errors(tags, tags_by_id, 'Тэг не найден')
+        if errors:
+            raise ValidationError(errors)
+        return [tags_by_id[pk] for pk in tags]
 
+    def validate(self, attrs):
+        """Ингредиенты и тэги обязательны и при изменении рецепта."""
+        missing = {field: 'Обязательное поле.'
+                   for field in ('ingredients', 'tags') if field not in attrs}
+        if missing:
+            raise ValidationError(missing)
         return attrs
 
     def validate_image(self, image):
@@ -175,6 +209,8 @@ class PostRecipesSerializer(serializers.ModelSerializer):
         return image
 
     def ingredients_amounts(self, ingredients, recipe):
+        if not ingredients:
+            return
         recipe_ingredients = []
         for ingredient_data in ingredients:
             amount = ingredient_data['amount']
@@ -186,6 +222,7 @@ class PostRecipesSerializer(serializers.ModelSerializer):
             recipe_ingredients.append(recipe_ingredient)
         IngredientsOfRecipe.objects.bulk_create(recipe_ingredients)
 
+    @transaction.atomic
     def create(self, validated_data):
         """Создание многострадального рецепта."""
         ingredients = validated_data.pop('ingredients')
@@ -193,35 +230,73 @@ class PostRecipesSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.ingredients_amounts(ingredients, recipe)
-
+        transaction.on_commit(lambda: submit(fan_out_recipe, recipe.pk))
         return recipe
 
+    def sync_ingredients(self, recipe, ingredients):
+        """
+        Приводит состав рецепта к переданному.
+
+        Пишутся только отличающиеся строки, возвращаются прежние количества.
+        """
+        new_amounts = {item['id']: item['amount'] for item in ingredients}
+        old_amounts, kept, changed, stale = Counter(), {}, [], []
+        for row in IngredientsOfRecipe.objects.filter(recipe=recipe):
+            ingredient = row.ingredient_id
+            old_amounts[ingredient] += row.amount
+            if ingredient not in new_amounts or ingredient in kept:
+                stale.append(row.pk)
+                continue
+            kept[ingredient] = row
+            if row.amount != new_amounts[ingredient]:
+                row.amount = new_amounts[ingredient]
+                changed.append(row)
+        if stale:
+            IngredientsOfRecipe.objects.filter(pk__in=stale).delete()
+        if changed:
+            IngredientsOfRecipe.objects.bulk_update(changed, ('amount',))
+        self.ingredients_amounts(
+            [item for item in ingredients if item['id'] not in kept], recipe)
+        return old_amounts, new_amounts
+
+    @staticmethod
+    def sync_tags(recipe, tags):
+        """Добавляет новые и убирает лишние тэги, не трогая остальные."""
+        current = set(recipe.tags.values_list('id', flat=True))
+        new = {tag.pk for tag in tags}
+        if current - new:
+            recipe.tags.remove(*(current - new))
+        if new - current:
+            recipe.tags.add(*(new - current))
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        """Обновление пецепта."""
+        """Обновление рецепта по разнице со старым составом."""
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         instance = super().update(instance, validated_data)
-        instance.ingredients.clear()
-        instance.tags.clear()
-        instance.tags.set(tags)
-        self.ingredients_amounts(ingredients, instance)
-        instance.save()
+        old_amounts, new_amounts = self.sync_ingredients(instance, ingredients)
+        CartIngredient.objects.change_recipe(
+            instance, old_amounts, new_amounts)
+        self.sync_tags(instance, tags)
         return instance
 
     def to_representation(self, instance):
         """Возвращение созданного рецепта пользователю."""
         request = self.context.get('request')
-        context = {'request': request}
-        return RecipesSerializer(instance,
-                                 context=context).data
+        instance = Recipe.objects.for_viewer(request.user).get(pk=instance.pk)
+        return RecipesSerializer(instance, context=self.context).data
 
 
 class UniversalRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор добавления рецепта в корзину."""
 
+    image = RecipeImageField('thumb')
+    image_webp = RecipeImageField('thumb', 'webp', fallback=False)
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_webp', 'cooking_time')
 
 
 class SubscribeUserSerializer(DjoserUserSerializer):
@@ -236,23 +311,49 @@ class SubscribeUserSerializer(DjoserUserSerializer):
                   'recipes', 'recipes_count')
         read_only_fields = ('email', 'username', 'first_name', 'last_name')
 
+    @staticmethod
+    def get_recipes_limit(request):
+        """Сколько рецептов автора показать, None - все, 0 - ни одного."""
+        try:
+            return query_int(request.query_params['recipes_limit'],
+                             minimum=0)
+        except (KeyError, ValueError):
+            return None
+
+    @classmethod
+    def prefetch_recipes(cls, authors, request):
+        """
+        Раздает авторам их первые рецепты, выбранные одним запросом.
+
+        Без этого get_recipes делает отдельный запрос на каждого автора.
+        """
+        recipes = {author.pk: [] for author in authors}
+        for recipe in Recipe.objects.filter(
+                author_id__in=list(recipes)).top_per_author(
+                    cls.get_recipes_limit(request)).only(
+                        'id', 'author_id', 'name', 'image',
+                        'variants_image', 'cooking_time'):
+            recipes[recipe.author_id].append(recipe)
+        for author in authors:
+            author.top_recipes = recipes[author.pk]
+
     def get_recipes(self, obj):
         """Получение рецептов автора."""
-        recipes = obj.recipes.all()
-        request = self.context.get('request')
-        recipes_limit = request.GET.get('recipes_limit')
-        if recipes_limit:
-            try:
-                recipes = recipes[:int(recipes_limit)]
-            except Exception:
-                pass
+        if hasattr(obj, 'top_recipes'):
+            recipes = obj.top_recipes
+        else:
+            recipes = obj.recipes.order_by('-date', '-id')
+            limit = self.get_recipes_limit(self.context.get('request'))
+            if limit is not None:
+                recipes = recipes[:limit]
         serializer = UniversalRecipeSerializer(recipes, many=True,
-                                               read_only=True)
+                                               read_only=True,
+                                               context=self.context)
         return serializer.data
 
     def get_recipes_count(self, obj):
-        """Количество рецептов автора."""
-        return obj.recipes.count()
+        """Количество рецептов автора из счетчика."""
+        return obj.recipes_count
 
 
 class PostSubscribeSerializer(serializers.ModelSerializer):
@@ -308,3 +409,13 @@ class CartSerializer(FavoriteSerializer):
     class Meta:
         model = Cart
         fields = ('user', 'recipe',)
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """Список id для пакетных операций."""
+
+    ids = serializers.ListField(
+        child=IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_ITEMS,
+    )
@@ -0,0 +1,64 @@
+import json
+from itertools import chain
+
+from django.http import StreamingHttpResponse
+
+from recipes.models import CartIngredient
+from .streaming import csv_lines
+
+FILENAME = 'Список покупок'
+CSV_HEADER = ('Ингредиент', 'Единица измерения', 'Количество')
+
+
+def shopping_list_rows(user):
+    """Итоги ингредиентов из корзины пользователя, читаются потоком."""
+    return CartIngredient.objects.filter(
+        user=user, total_amount__gt=0
+    ).order_by('ingredient__name').values_list(
+        'ingredient__name', 'ingredient__measurement_unit', 'total_amount'
+    ).iterator()
+
+
+def text_lines(rows):
+    """Нумерованный текстовый список."""
+    yield 'Список покупок.\n'
+    for number, (name, unit, amount) in enumerate(rows, start=1):
+        yield f'{number}) {name[:1].upper()}{name[1:]} - {unit} ({amount})\n'
+
+
+def json_chunks(rows):
+    """JSON-массив, который пишется по одному элементу."""
+    separator = '['
+    for name, unit, amount in rows:
+        yield separator + json.dumps(
+            {'name': name, 'measurement_unit': unit, 'amount': amount},
+            ensure_ascii=False)
+        separator = ',\n'
+    yield '[]' if separator == '[' else ']'
+
+
+EXPORTERS = {
+    'txt': (text_lines, 'text/plain'),
+    'csv': (lambda rows: csv_lines(CSV_HEADER, rows), 'text/csv'),
+    'json': (json_chunks, 'application/json'),
+}
+
+
+def shopping_list_response(user, export_format):
+    """
+    Потоковый ответ со списком покупок.
+
+    Возвращает None, если корзина пуста: первая строка читается заранее,
+    отдельный запрос на проверку корзины не нужен.
+    """
+    rows = shopping_list_rows(user)
+    first = next(rows, None)
+    if first is None:
+        return None
+    lines, content_type = EXPORTERS[export_format]
+    response = StreamingHttpResponse(
+        lines(chain((first,), rows)),
+        content_type=f'{content_type}; charset=utf-8')
+    response['Content-Disposition'] = (f'attachment; '
+                                       f'filename={FILENAME}.{export_format}')
+    return response
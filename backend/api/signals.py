@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from recipes.models import Ingredient, IngredientsOfRecipe, Recipe, Tag, User
+from .cache import RECIPES_SCOPE, bump_generation
+
+CACHE_SCOPES = {
+    Recipe: (RECIPES_SCOPE,),
+    IngredientsOfRecipe: (RECIPES_SCOPE,),
+    User: (RECIPES_SCOPE,),
+    Tag: (RECIPES_SCOPE,),
+    Ingredient: (RECIPES_SCOPE,),
+    Recipe.tags.through: (RECIPES_SCOPE,),
+}
+SERVICE_USER_FIELDS = frozenset(('last_login',))
+
+
+def invalidate_cache(sender, **kwargs):
+    """Сбрасывает кэш областей модели после фиксации транзакции."""
+    update_fields = kwargs.get('update_fields')
+    if sender is User and update_fields and set(
+            update_fields) <= SERVICE_USER_FIELDS:
+        return
+    if kwargs.get('action', 'post_').startswith('pre_'):
+        return
+    for scope in CACHE_SCOPES[sender]:
+        transaction.on_commit(lambda scope=scope: bump_generation(scope))
+
+
+for model in CACHE_SCOPES:
+    if model is Recipe.tags.through:
+        m2m_changed.connect(invalidate_cache, sender=model)
+        continue
+    post_save.connect(invalidate_cache, sender=model)
+    post_delete.connect(invalidate_cache, sender=model)
@@ -0,0 +1,16 @@
+import csv
+
+
+class Echo:
+    """Псевдо-файл для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows):
+    """Построчно отдает CSV, не собирая файл целиком в памяти."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
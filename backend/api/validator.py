@@ -10,3 +10,18 @@ def cooking_time_validator(value):
             raise ValidationError('Неверно указано время!')
     except ValueError:
         raise ValidationError('Неверный формат')
+
+
+def query_int(value, minimum=1, cutoff=None):
+    """
+    Целое число из параметра запроса не меньше minimum.
+
+    Значение больше cutoff обрезается до cutoff,
+    нечисло и значение меньше minimum дают ValueError.
+    """
+    number = int(value)
+    if number < minimum:
+        raise ValueError(f'Значение меньше {minimum}: {number}.')
+    if cutoff is not None:
+        return min(number, cutoff)
+    return number
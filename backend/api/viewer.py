@@ -0,0 +1,68 @@
+from django.utils.functional import cached_property
+
+VIEWER_STATE_ATTR = '_viewer_state'
+
+
+class ViewerState:
+    """
+    Состояние текущего пользователя в рамках одного запроса.
+
+    Подписки, избранное и корзина загружаются один раз и по требованию
+    в виде множеств id, дальше проверки идут в памяти.
+    """
+
+    def __init__(self, user):
+        """Запоминаем пользователя, данные пока не загружаем."""
+        self.user = user
+
+    def _load_ids(self, related_name, field):
+        if not self.user.is_authenticated:
+            return frozenset()
+        return frozenset(getattr(self.user, related_name).values_list(
+            field, flat=True))
+
+    @cached_property
+    def subscribed_author_ids(self):
+        """Id авторов, на которых подписан пользователь."""
+        return self._load_ids('follower', 'author_id')
+
+    @cached_property
+    def favorite_recipe_ids(self):
+        """Id рецептов в избранном пользователя."""
+        return self._load_ids('favorites', 'recipe_id')
+
+    @cached_property
+    def cart_recipe_ids(self):
+        """Id рецептов в корзине пользователя."""
+        return self._load_ids('cart', 'recipe_id')
+
+    def is_subscribed(self, author):
+        """Подписан ли пользователь на автора."""
+        return author.pk in self.subscribed_author_ids
+
+    def is_favorited(self, recipe):
+        """Добавлен ли рецепт в избранное."""
+        return recipe.pk in self.favorite_recipe_ids
+
+    def is_in_shopping_cart(self, recipe):
+        """Добавлен ли рецепт в корзину."""
+        return recipe.pk in self.cart_recipe_ids
+
+
+def get_viewer_state(request):
+    """Возвращает состояние пользователя, общее для всего запроса."""
+    http_request = getattr(request, '_request', request)
+    state = getattr(http_request, VIEWER_STATE_ATTR, None)
+    if state is None:
+        state = ViewerState(request.user)
+        setattr(http_request, VIEWER_STATE_ATTR, state)
+    return state
+
+
+class ViewerStateContextMixin:
+    """Передает состояние пользователя в контекст сериализаторов."""
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['viewer'] = get_viewer_state(self.request)
+        return context
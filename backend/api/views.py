@@ -1,28 +1,42 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
+from django.db.models import Value
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
-from recipes.models import (Cart, Favorite, Ingredient, IngredientsOfRecipe,
-                            Recipe, Subscription, Tag, User)
+from recipes.models import (Cart, CartIngredient, Favorite, FeedItem,
+                            Ingredient, Recipe, Subscription, Tag, User)
+from recipes.counters import change_counter
+from recipes.tasks import backfill_feed, submit
+from .autocomplete import IngredientAutocompleteMixin
+from .bulk import FORBIDDEN, bulk_link, bulk_unlink, unique_ids
+from .cache import AnonymousResponseCacheMixin
+from .catalog import INGREDIENTS_SCOPE, TAGS_SCOPE, CatalogSnapshotMixin
+from .feed import FeedPagination, feed_sources
 from .filters import ChangSearchForName, FilterForRecipe
-from .pagination import UserPagination
+from .pagination import RecipePagination, UserPagination
+from .parsers import JSONFieldsMultiPartParser
 from .permission import AuthorOrReadOnly
-from .serializers import (CartSerializer, DjoserUserSerializer,
-                          FavoriteSerializer, IngredientsSerializer,
-                          PostRecipesSerializer, PostSubscribeSerializer,
-                          RecipesSerializer, SubscribeUserSerializer,
-                          TagsSerializer)
+from .renderers import CSVRenderer, PlainTextRenderer
+from .serializers import (BulkIdsSerializer, CartSerializer,
+                          DjoserUserSerializer, FavoriteSerializer,
+                          IngredientsSerializer, PostRecipesSerializer,
+                          PostSubscribeSerializer, RecipesSerializer,
+                          SubscribeUserSerializer, TagsSerializer)
+from .shopping_list import shopping_list_response
+from .viewer import ViewerStateContextMixin
 
 
-class DjoserUserViewSet(UserViewSet):
+class DjoserUserViewSet(ViewerStateContextMixin, UserViewSet):
     """Представление пользователей."""
 
     queryset = User.objects.all()
@@ -43,52 +57,117 @@ class DjoserUserViewSet(UserViewSet):
     def subscriptions(self, request):
         """Все подписки пользователя."""
         page = self.paginate_queryset(User.objects.filter(
-            following__subscriber=request.user))
+            following__subscriber=request.user
+        ).annotate(is_subscribed=Value(True)).order_by('id'))
+        SubscribeUserSerializer.prefetch_recipes(page, request)
         serializer = SubscribeUserSerializer(page, many=True,
                                              context={'request': request})
         return self.get_paginated_response(serializer.data)
 
+    def subscribed(self, author_ids):
+        """
+        Подписки записаны: счетчики авторов растут в той же транзакции.
+
+        Лента заполняется в фоне после фиксации.
+        """
+        change_counter(Subscription, author_ids, 1)
+        subscriber_id = self.request.user.id
+        transaction.on_commit(lambda: submit(
+            backfill_feed, subscriber_id, tuple(author_ids)))
+
+    def unsubscribed(self, author_ids):
+        """Подписки удалены: счетчики и лента меняются сразу."""
+        change_counter(Subscription, author_ids, -1)
+        FeedItem.objects.trim(self.request.user.id, author_ids)
+
     @action(methods=['post', 'delete'],
             permission_classes=(IsAuthenticated,),
             detail=True)
     def subscribe(self, request, id):
         """Подписка."""
-        get_object_or_404(User, id=id)
+        author = get_object_or_404(User, id=id)
         if request.method == 'POST':
             subscriber = request.user
             data = {'subscriber': subscriber.id, 'author': id}
             serializer = PostSubscribeSerializer(data=data,
                                                  context={'request': request})
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                self.subscribed((author.id,))
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        data = Subscription.objects.filter(subscriber_id=request.user.id,
-                                           author_id=id)
-        if data.exists():
-            data.delete()
+        with transaction.atomic():
+            deleted, _ = Subscription.objects.filter(
+                subscriber_id=request.user.id, author_id=id).delete()
+            if deleted:
+                self.unsubscribed((author.id,))
+        if deleted:
             return Response({'Успех': 'Вы отписаны от автора'},
                             status=status.HTTP_204_NO_CONTENT)
         return Response({'Ошибка': 'Неверные данные'},
                         status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=['post', 'delete'],
+            permission_classes=(IsAuthenticated,),
+            detail=False,
+            url_path='subscribe/bulk')
+    def subscribe_bulk(self, request):
+        """Пакетная подписка и отписка от авторов."""
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = unique_ids(serializer.validated_data['ids'])
+        valid_ids = set(User.objects.filter(id__in=ids).exclude(
+            id=request.user.id).values_list('id', flat=True))
+        handler, on_change = (
+            (bulk_link, self.subscribed) if request.method == 'POST'
+            else (bulk_unlink, self.unsubscribed))
+        results = handler(Subscription, 'subscriber', request.user,
+                          'author', ids, valid_ids, on_change)
+        for item in results:
+            if item['id'] == request.user.id:
+                item['status'] = FORBIDDEN
+        return Response({'results': results})
+
 
-class TagsViewSet(viewsets.ReadOnlyModelViewSet):
+class TagsViewSet(CatalogSnapshotMixin, viewsets.ReadOnlyModelViewSet):
     """Представление тэгов."""
 
+    catalog_scope = TAGS_SCOPE
     queryset = Tag.objects.all()
     serializer_class = TagsSerializer
     pagination_class = None
 
 
-class RecipesViewsSet(ModelViewSet):
+class RecipesViewsSet(AnonymousResponseCacheMixin, ViewerStateContextMixin,
+                      ModelViewSet):
     """Представление рецептов."""
 
     queryset = Recipe.objects.all()
     permission_classes = (AuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = FilterForRecipe
-    pagination_class = UserPagination
+    pagination_class = RecipePagination
+    parser_classes = (JSONParser, JSONFieldsMultiPartParser)
+
+    def initialize_request(self, request, *args, **kwargs):
+        """Загружаемые картинки пишутся сразу во временный файл."""
+        request.upload_handlers = [TemporaryFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def get_queryset(self):
+        """Рецепты с отметками пользователя и связанными данными."""
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            return queryset.for_viewer(self.request.user)
+        return queryset
+
+    def get_serializer_context(self):
+        """Страница рецепта получает картинку полного размера."""
+        context = super().get_serializer_context()
+        if self.action == 'retrieve':
+            context['image_variant'] = 'full'
+        return context
 
     def get_serializer_class(self):
         """Выбор серилизатора."""
@@ -120,12 +199,19 @@ class RecipesViewsSet(ModelViewSet):
     def shopping_cart(self, request, pk):
         """Добавление/удаление рецепта в корзину."""
         if request.method == 'POST':
-            return self.shopping_cart_and_favorite_serialization(
-                CartSerializer, request, pk)
-        data = Cart.objects.filter(
-            user_id=request.user.id, recipe_id=pk)
-        if data.exists():
-            data.delete()
+            with transaction.atomic():
+                response = self.shopping_cart_and_favorite_serialization(
+                    CartSerializer, request, pk)
+                CartIngredient.objects.add_recipes(request.user, (pk,))
+                change_counter(Cart, (pk,), 1)
+            return response
+        with transaction.atomic():
+            deleted, _ = Cart.objects.filter(
+                user_id=request.user.id, recipe_id=pk).delete()
+            if deleted:
+                CartIngredient.objects.remove_recipes(request.user, (pk,))
+                change_counter(Cart, (pk,), -1)
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
         get_object_or_404(Recipe, id=pk)
         return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -136,51 +222,103 @@ class RecipesViewsSet(ModelViewSet):
     def favorite(self, request, pk):
         """Добавление/удаление избранных рецептов."""
         if request.method == 'POST':
-            return self.shopping_cart_and_favorite_serialization(
-                FavoriteSerializer, request, pk)
-
-        data = Favorite.objects.filter(user=request.user, recipe__id=pk)
-        if data.exists():
-            data.delete()
+            with transaction.atomic():
+                response = self.shopping_cart_and_favorite_serialization(
+                    FavoriteSerializer, request, pk)
+                change_counter(Favorite, (pk,), 1)
+            return response
+        with transaction.atomic():
+            deleted, _ = Favorite.objects.filter(
+                user=request.user, recipe_id=pk).delete()
+            if deleted:
+                change_counter(Favorite, (pk,), -1)
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
         get_object_or_404(Recipe, id=pk)
         return Response({'ошибка': 'Такого рецепта нет'},
                         status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=['get'],
+            permission_classes=(IsAuthenticated,),
+            detail=False)
+    def feed(self, request):
+        """Лента рецептов авторов, на которых подписан пользователь."""
+        paginator = FeedPagination()
+        page = paginator.paginate_sources(feed_sources(request.user),
+                                          request)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    def bulk_recipes(self, request, model, on_add=None, on_remove=None):
+        """
+        Пакетное добавление или удаление рецептов пользователя.
+
+        Счетчики рецептов меняются в транзакции самой записи.
+        """
+        def added(ids):
+            change_counter(model, ids, 1)
+            if on_add is not None:
+                on_add(ids)
+
+        def removed(ids):
+            change_counter(model, ids, -1)
+            if on_remove is not None:
+                on_remove(ids)
+
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = unique_ids(serializer.validated_data['ids'])
+        valid_ids = set(Recipe.objects.filter(id__in=ids).values_list(
+            'id', flat=True))
+        if request.method == 'POST':
+            results = bulk_link(model, 'user', request.user, 'recipe',
+                                ids, valid_ids, added)
+        else:
+            results = bulk_unlink(model, 'user', request.user, 'recipe',
+                                  ids, valid_ids, removed)
+        return Response({'results': results})
+
+    @action(methods=['post', 'delete'],
+            permission_classes=[IsAuthenticated],
+            detail=False,
+            url_path='favorite/bulk')
+    def favorite_bulk(self, request):
+        """Пакетное добавление/удаление избранных рецептов."""
+        return self.bulk_recipes(request, Favorite)
+
+    @action(methods=['post', 'delete'],
+            permission_classes=[IsAuthenticated],
+            detail=False,
+            url_path='shopping_cart/bulk')
+    def shopping_cart_bulk(self, request):
+        """Пакетное добавление/удаление рецептов в корзину."""
+        return self.bulk_recipes(
+            request, Cart,
+            on_add=lambda ids: CartIngredient.objects.add_recipes(
+                request.user, ids),
+            on_remove=lambda ids: CartIngredient.objects.remove_recipes(
+                request.user, ids),
+        )
+
     @action(methods=['get'],
             permission_classes=[IsAuthenticated],
+            renderer_classes=(PlainTextRenderer, CSVRenderer,
+                              JSONRenderer),
             detail=False)
     def download_shopping_cart(self, request):
-        """Скачивание рецепта."""
-        if request.user.cart.exists():
-            ingredients_recipe = IngredientsOfRecipe.objects.filter(
-                recipe__cart__user=request.user)
-            values = ingredients_recipe.values('ingredient__name',
-                                               'ingredient__measurement_unit')
-            ingredients = values.annotate(amount=Sum('amount'))
-
-            shop_cart = 'Список покупок.\n'
-            list_order = 0
-            for ingredient in ingredients:
-                list_order += 1
-                shop_cart += (f'{list_order}) '
-                              f'{ingredient["ingredient__name"][0].upper()}'
-                              f'{ingredient["ingredient__name"][1:]} - '
-                              f'{ingredient["ingredient__measurement_unit"]} '
-                              f'({ingredient["amount"]})\n')
-
-            filename = 'Список покупок.txt'
-            response = HttpResponse(shop_cart,
-                                    content_type='text/plain')
-            response['Content-Disposition'] = (f'attachment; '
-                                               f'filename={filename}')
-            return response
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        """Скачивание списка покупок в формате txt, csv или json."""
+        response = shopping_list_response(
+            request.user, request.accepted_renderer.format)
+        if response is None:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        return response
 
 
-class IngredientsViewsSet(viewsets.ReadOnlyModelViewSet):
+class IngredientsViewsSet(IngredientAutocompleteMixin, CatalogSnapshotMixin,
+                          viewsets.ReadOnlyModelViewSet):
     """Представление ингредиентов."""
 
+    catalog_scope = INGREDIENTS_SCOPE
     queryset = Ingredient.objects.all()
     serializer_class = IngredientsSerializer
     pagination_class = None
@@ -5,3 +5,21 @@ MAX_LENGHT_TEXT = 1000
 LESS_THEN_MINIMUM_INGREDIENTS = 1
 MIN_COOKING_TIME = 0
 MAX_COOKING_TIME = 1000
+MAX_PAGE_SIZE = 100
+SEARCH_CONFIG = 'russian'
+CART_TOTALS_BATCH_SIZE = 1000
+MAX_BULK_ITEMS = 100
+IMAGE_VARIANTS = {'thumb': 160, 'card': 480, 'full': 1280}
+IMAGE_FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+IMAGE_QUALITY = 82
+FEED_BACKFILL_SIZE = 50
+FEED_BATCH_SIZE = 1000
+ADMIN_EXPORT_CHUNK_SIZE = 2000
+MAX_TAG_BITS = 63
+QUERY_PLAN_MIN_ROWS = 1000
+DATASET_BATCH_SIZE = 10000
+DATASET_PASSWORD = 'Praktikum+123'
+DATASET_ZIPF_EXPONENT = 1.1
+LOADTEST_CONCURRENCY = 4
+LOADTEST_DURATION = 10
+LOADTEST_MIX = 'guest=30,reader=50,cook=20'
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -22,6 +23,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'api.apps.ApiConfig',
@@ -32,6 +34,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.querystats.QueryStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,6 +62,13 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+PAGINATION_COUNT_STRATEGY = os.getenv('PAGINATION_COUNT_STRATEGY',
+                                      'api.pagination.ExactCount')
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', 30))
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = int(
+    os.getenv('PAGINATION_COUNT_ESTIMATE_THRESHOLD', 100000))
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'SERIALIZERS': {
@@ -112,6 +122,49 @@ else:
         }
     }
 
+if DEBUG:
+    DEFAULT_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+    DEFAULT_CACHE_LOCATION = ''
+else:
+    DEFAULT_CACHE_BACKEND = (
+        'django.core.cache.backends.filebased.FileBasedCache')
+    DEFAULT_CACHE_LOCATION = os.path.join(BASE_DIR, 'cache')
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', DEFAULT_CACHE_BACKEND),
+        'LOCATION': os.getenv('CACHE_LOCATION', DEFAULT_CACHE_LOCATION),
+    }
+}
+
+RESPONSE_CACHE_ALIAS = os.getenv('RESPONSE_CACHE_ALIAS', 'default')
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300))
+
+AUTOCOMPLETE_INDEX_DIR = os.getenv(
+    'AUTOCOMPLETE_INDEX_DIR',
+    os.path.join(tempfile.gettempdir(), 'foodgram-autocomplete'))
+INGREDIENT_AUTOCOMPLETE_LIMIT = int(
+    os.getenv('INGREDIENT_AUTOCOMPLETE_LIMIT', 20))
+INGREDIENT_AUTOCOMPLETE_MAX_LIMIT = int(
+    os.getenv('INGREDIENT_AUTOCOMPLETE_MAX_LIMIT', 100))
+
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', 2))
+
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 5000))
+FEED_CELEBRITY_CACHE_TIMEOUT = int(
+    os.getenv('FEED_CELEBRITY_CACHE_TIMEOUT', 300))
+
+QUERY_STATS_HEADERS = os.getenv('QUERY_STATS_HEADERS', 'False') == 'True'
+QUERY_STATS_LOG = os.getenv('QUERY_STATS_LOG', 'False') == 'True'
+QUERY_BUDGETS = {
+    'GET recipes-list': 7,
+    'GET recipes-detail': 6,
+    'GET recipes-feed': 6,
+    'GET recipes-download-shopping-cart': 3,
+    'GET users-subscriptions': 4,
+    'GET users-detail': 3,
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
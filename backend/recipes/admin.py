@@ -1,26 +1,44 @@
 from django.contrib import admin
 
+from .admin_filters import AutocompleteFilter, AutocompleteFilterMixin
+from .admin_tools import CSVExportMixin, EstimatedCountPaginator
 from .models import (Cart, Favorite, Ingredient, IngredientsOfRecipe, Recipe,
                      Subscription, Tag, User)
 
 
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
+class CartAdmin(CSVExportMixin, AutocompleteFilterMixin,
+                admin.ModelAdmin):
     """Админка корзины."""
 
     list_display = ('user', 'recipe')
-    search_fields = ('user', 'recipe')
-    list_filter = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__email', 'user__username', 'recipe__name')
+    list_filter = (('user', AutocompleteFilter),
+                   ('recipe', AutocompleteFilter))
+    autocomplete_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    export_fields = ('id', 'user_id', 'user__email', 'recipe_id',
+                     'recipe__name')
     empty_value_display = '=пусто='
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(CSVExportMixin, AutocompleteFilterMixin,
+                    admin.ModelAdmin):
     """Админка Избранного."""
 
     list_display = ('user', 'recipe')
-    search_fields = ('user', 'recipe')
-    list_filter = ('user',)
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__email', 'user__username', 'recipe__name')
+    list_filter = (('user', AutocompleteFilter),
+                   ('recipe', AutocompleteFilter))
+    autocomplete_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    export_fields = ('id', 'user_id', 'user__email', 'recipe_id',
+                     'recipe__name')
     empty_value_display = '=пусто='
 
 
@@ -30,17 +48,24 @@ class IngredientAdmin(admin.ModelAdmin):
 
     list_display = ('id', 'name', 'measurement_unit')
     search_fields = ('id', 'name', 'measurement_unit')
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
     empty_value_display = '=пусто='
 
 
 @admin.register(IngredientsOfRecipe)
-class IngredientsOfRecipeAdmin(admin.ModelAdmin):
+class IngredientsOfRecipeAdmin(CSVExportMixin, AutocompleteFilterMixin,
+                               admin.ModelAdmin):
     """Админка игнредиентов рецепта."""
 
     list_display = ('recipe', 'ingredient', 'amount')
-    search_fields = ('recipe', 'ingredient', 'amount')
-    list_filter = ('ingredient',)
+    list_select_related = ('recipe', 'ingredient')
+    search_fields = ('recipe__name', 'ingredient__name')
+    list_filter = (('ingredient', AutocompleteFilter),)
+    autocomplete_fields = ('recipe', 'ingredient')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    export_fields = ('id', 'recipe_id', 'recipe__name', 'ingredient_id',
+                     'ingredient__name', 'amount')
     empty_value_display = '=пусто='
 
 
@@ -53,18 +78,25 @@ class RecipeIngredientAdmin(admin.StackedInline):
 
 
 @admin.register(Recipe)
-class RecipesAdmin(admin.ModelAdmin):
+class RecipesAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     """Админка рецептов."""
 
     list_display = ('id', 'author_name', 'name', 'text', 'cooking_time',
                     'recipes_ingredients', 'recipes_tags', 'favorite_count',
                     'image')
-    list_filter = ('tags', 'author', 'name')
+    list_filter = ('tags', ('author', AutocompleteFilter))
     search_fields = ('name', 'cooking_time', 'tags__name',
                      'author__email', 'ingredients__name')
+    autocomplete_fields = ('author',)
     empty_value_display = '=пусто='
     inlines = (RecipeIngredientAdmin,)
 
+    def get_queryset(self, request):
+        """Автор, тэги и ингредиенты списка грузятся тремя запросами."""
+        return super().get_queryset(request).select_related(
+            'author').prefetch_related('tags', 'ingredients').defer(
+                'search_vector')
+
     @admin.display(description='автор')
     def author_name(self, obj):
         """Возвращаем юзернэйм автора рецепта."""
@@ -89,17 +121,26 @@ class RecipesAdmin(admin.ModelAdmin):
     @admin.display(description='отметок в избраном')
     def favorite_count(self, obj):
         """Возвращаем количество отметок в избраном у рецепта."""
-        return obj.favorites.count()
+        return obj.favorites_count
 
 
 @admin.register(Subscription)
-class SubscriptionsAdmin(admin.ModelAdmin):
+class SubscriptionsAdmin(CSVExportMixin, AutocompleteFilterMixin,
+                         admin.ModelAdmin):
     """Админка подписок."""
 
     list_display = ('id', 'author', 'subscriber',
                     'email_subscriber', 'email_author')
-    search_fields = ('author', 'subscriber')
-    list_filter = ('author', 'subscriber')
+    list_select_related = ('author', 'subscriber')
+    search_fields = ('author__email', 'author__username',
+                     'subscriber__email', 'subscriber__username')
+    list_filter = (('author', AutocompleteFilter),
+                   ('subscriber', AutocompleteFilter))
+    autocomplete_fields = ('author', 'subscriber')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    export_fields = ('id', 'author_id', 'author__email', 'subscriber_id',
+                     'subscriber__email')
     empty_value_display = '=пусто='
 
     @admin.display(description='Почта подписчика')
@@ -131,5 +172,5 @@ class UserAdmin(admin.ModelAdmin):
                     'last_name', 'password')
     search_fields = ('email', 'username', 'first_name',
                      'last_name', 'password')
-    list_filter = ('email', 'username', 'first_name', 'last_name')
+    list_filter = ('is_staff', 'is_active')
     empty_value_display = '=пусто='
@@ -0,0 +1,56 @@
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Фильтр по связанному объекту с поиском вместо полного списка.
+
+    Варианты подгружаются автодополнением админки, на странице
+    загружается только выбранный объект. У админки связанной
+    модели должны быть заданы search_fields.
+    """
+
+    template = 'admin/recipes/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin,
+                 field_path):
+        """Готовим виджет автодополнения для поля."""
+        self.lookup_kwarg = (
+            f'{field_path}__{field.target_field.attname}__exact')
+        self.lookup_val = params.get(self.lookup_kwarg)
+        super().__init__(field, request, params, model, model_admin,
+                         field_path)
+        form_field = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(field, model_admin.admin_site),
+            required=False,
+        )
+        self.rendered_widget = form_field.widget.render(
+            self.lookup_kwarg, self.lookup_val,
+            attrs={'id': f'autocomplete-filter-{field_path}'})
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(
+                remove=[self.lookup_kwarg]),
+            'display': 'Все',
+        }
+
+
+class AutocompleteFilterMixin:
+    """Подключает к списку скрипты фильтров с автодополнением."""
+
+    @property
+    def media(self):
+        return (super().media
+                + AutocompleteSelect(None, self.admin_site).media
+                + forms.Media(js=('recipes/admin/autocomplete_filter.js',)))
@@ -0,0 +1,111 @@
+from django.conf import settings
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.db import connections
+from django.http import StreamingHttpResponse
+from django.urls import path
+from django.utils.functional import cached_property
+
+from api.pagination import CountingPaginator, ExactCount
+from api.streaming import csv_lines
+from constants import ADMIN_EXPORT_CHUNK_SIZE
+
+
+def estimated_rows(queryset):
+    """Оценка числа строк таблицы из pg_class.reltuples или None."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples FROM pg_class '
+                       'WHERE oid = to_regclass(%s)',
+                       (queryset.model._meta.db_table,))
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(CountingPaginator):
+    """
+    Пагинатор админки без COUNT(*) по всей таблице.
+
+    Для списка без фильтров и поиска берет оценку PostgreSQL,
+    если она больше PAGINATION_COUNT_ESTIMATE_THRESHOLD.
+    Отфильтрованные списки считаются точно. Оценка только
+    показывается: страница нарезается без нее, а страниц не меньше,
+    чем видно по уже прочитанным строкам.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Без оценки список считается точно."""
+        kwargs.setdefault('count_strategy', ExactCount())
+        super().__init__(*args, **kwargs)
+        self.seen_pages = 0
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.where:
+            estimate = estimated_rows(queryset)
+            if (estimate is not None and estimate
+                    >= settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD):
+                self.count_is_exact = False
+                return estimate
+        return super().count
+
+    @property
+    def num_pages(self):
+        """Число страниц по оценке, но не меньше уже увиденных."""
+        return max(super().num_pages, self.seen_pages)
+
+    def page(self, number):
+        page = super().page(number)
+        self.seen_pages = max(self.seen_pages,
+                              page.number + page.has_next())
+        return page
+
+
+class CSVExportMixin:
+    """
+    Потоковая выгрузка списка админки в CSV.
+
+    Действие выгружает выбранные строки, ссылка над списком -
+    все строки с текущими фильтрами. Строки читаются
+    порциями через iterator и сразу уходят клиенту.
+    """
+
+    export_fields = None
+    actions = ('export_csv',)
+    change_list_template = 'admin/recipes/change_list_export.html'
+
+    def get_export_fields(self):
+        return self.export_fields or [
+            field.attname for field in self.model._meta.concrete_fields]
+
+    def csv_response(self, queryset):
+        fields = self.get_export_fields()
+        rows = queryset.order_by('pk').values_list(*fields).iterator(
+            chunk_size=ADMIN_EXPORT_CHUNK_SIZE)
+        response = StreamingHttpResponse(csv_lines(fields, rows),
+                                         content_type='text/csv')
+        response['Content-Disposition'] = (
+            f'attachment; filename="{self.model._meta.model_name}.csv"')
+        return response
+
+    @admin.action(description='Выгрузить выбранное в CSV')
+    def export_csv(self, request, queryset):
+        return self.csv_response(queryset)
+
+    def export_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        changelist = self.get_changelist_instance(request)
+        return self.csv_response(changelist.get_queryset(request))
+
+    def get_urls(self):
+        opts = self.model._meta
+        return [path(
+            'export/', self.admin_site.admin_view(self.export_view),
+            name=f'{opts.app_label}_{opts.model_name}_export',
+        )] + super().get_urls()
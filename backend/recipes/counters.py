@@ -0,0 +1,49 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Cart, Favorite, Recipe, Subscription, User
+
+COUNTERS = {
+    Favorite: (Recipe, 'favorites_count', 'recipe'),
+    Cart: (Recipe, 'carts_count', 'recipe'),
+    Subscription: (User, 'followers_count', 'author'),
+    Recipe: (User, 'recipes_count', 'author'),
+}
+
+
+def change_counter(link_model, target_ids, delta):
+    """
+    Сдвигает счетчик связей link_model у объектов на delta.
+
+    Это один UPDATE с F(), вызывается в той же транзакции,
+    что и запись самих связей.
+    """
+    model, field, _ = COUNTERS[link_model]
+    model.objects.filter(pk__in=target_ids).update(
+        **{field: F(field) + delta})
+
+
+def actual_count(link_model):
+    """Выражение с настоящим числом связей объекта."""
+    _, _, link_field = COUNTERS[link_model]
+    return Coalesce(Subquery(link_model.objects.filter(
+        **{link_field: OuterRef('pk')}
+    ).order_by().values(link_field).annotate(
+        total=Count('pk')
+    ).values('total')), 0)
+
+
+def counter_drift(link_model):
+    """Объекты с разошедшимся счетчиком: (id, в счетчике, на самом деле)."""
+    model, field, _ = COUNTERS[link_model]
+    return model.objects.annotate(
+        actual=actual_count(link_model),
+    ).exclude(**{field: F('actual')}).values_list(
+        'pk', field, 'actual').order_by('pk')
+
+
+def reconcile_counter(link_model, target_ids):
+    """Пересчитывает счетчик у объектов из настоящих связей."""
+    model, field, _ = COUNTERS[link_model]
+    model.objects.filter(pk__in=target_ids).update(
+        **{field: actual_count(link_model)})
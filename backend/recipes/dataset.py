@@ -0,0 +1,234 @@
+import csv
+import io
+import itertools
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+from constants import (DATASET_BATCH_SIZE, DATASET_PASSWORD,
+                       DATASET_ZIPF_EXPONENT, FEED_BACKFILL_SIZE)
+
+from .models import (Cart, Favorite, FeedItem, IngredientsOfRecipe, Recipe,
+                     Subscription, User)
+
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Олег', 'Елена', 'Петр', 'Ольга',
+               'Сергей', 'Дарья', 'Никита')
+LAST_NAMES = ('Иванова', 'Петров', 'Смирнова', 'Кузнецов', 'Попова',
+              'Соколов', 'Лебедева', 'Козлов', 'Новикова', 'Морозов')
+DISHES = ('суп', 'салат', 'пирог', 'рагу', 'запеканка', 'каша', 'омлет',
+          'паста', 'плов', 'шашлык', 'блины', 'торт')
+ADJECTIVES = ('домашний', 'быстрый', 'летний', 'пряный', 'легкий',
+              'сытный', 'бабушкин', 'праздничный', 'острый', 'сладкий')
+WORDS = ('нарезать', 'смешать', 'добавить', 'посолить', 'обжарить',
+         'варить', 'запекать', 'до', 'готовности', 'минут', 'на', 'среднем',
+         'огне', 'подавать', 'горячим', 'с', 'зеленью', 'и', 'соусом')
+PLACEHOLDER_IMAGE = 'recipes/dataset.jpg'
+
+
+def zipf_cum_weights(size, exponent=DATASET_ZIPF_EXPONENT):
+    """Накопленные веса степенного закона для random.choices."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)))
+
+
+def next_id(model):
+    """Первый свободный id таблицы."""
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def chunked(rows, size):
+    """Разбивает поток строк на списки по size."""
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def insert_rows(model, fields, rows, batch_size=DATASET_BATCH_SIZE):
+    """
+    Пишет строки в таблицу модели порциями, минуя ORM и сигналы.
+
+    В PostgreSQL порция уходит одним COPY, в остальных базах
+    одним executemany. Возвращает число записанных строк.
+    """
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = ', '.join(
+        quote(model._meta.get_field(field).column) for field in fields)
+    count = 0
+    with connection.cursor() as cursor:
+        for chunk in chunked(rows, batch_size):
+            if connection.vendor == 'postgresql':
+                buffer = io.StringIO()
+                csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(
+                    chunk)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)',
+                    buffer)
+            else:
+                placeholders = ', '.join(['%s'] * len(fields))
+                cursor.executemany(
+                    f'INSERT INTO {table} ({columns}) '
+                    f'VALUES ({placeholders})', chunk)
+            count += len(chunk)
+    return count
+
+
+def reset_sequences(models):
+    """Сдвигает последовательности id за вставленные вручную строки."""
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+class Dataset:
+    """
+    Синтетические данные с перекосом как в жизни.
+
+    Число рецептов у авторов, подписчиков у них же, ингредиентов
+    в рецептах и добавлений рецептов в избранное и корзины
+    распределено по степенному закону: немногие популярны,
+    у остальных длинный хвост. При одном seed данные одинаковые.
+    """
+
+    def __init__(self, rng, tags, ingredient_ids, days):
+        """Запоминаем справочники и начало периода публикаций."""
+        self.rng = rng
+        self.tags = tags
+        self.ingredient_ids = list(ingredient_ids)
+        rng.shuffle(self.ingredient_ids)
+        self.ingredient_weights = zipf_cum_weights(len(self.ingredient_ids))
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=days)
+        self.adapt_date = connection.ops.adapt_datetimefield_value
+
+    def users(self, count):
+        first = next_id(User)
+        self.user_ids = list(range(first, first + count))
+        password = make_password(DATASET_PASSWORD)
+        joined = self.adapt_date(self.start)
+        for pk in self.user_ids:
+            yield (pk, password, False, f'user{pk}',
+                   self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES),
+                   f'user{pk}@example.com', False, True, joined, 0, 0)
+
+    def recipes(self, count):
+        first = next_id(Recipe)
+        self.recipe_ids = list(range(first, first + count))
+        self.recipe_tags = {}
+        self.recipes_by_author = {}
+        authors = list(self.user_ids)
+        self.rng.shuffle(authors)
+        self.authors = authors
+        self.author_weights = zipf_cum_weights(len(authors))
+        step = (self.now - self.start) / max(count, 1)
+        for position, pk in enumerate(self.recipe_ids):
+            author = self.rng.choices(
+                authors, cum_weights=self.author_weights)[0]
+            tags = self.rng.sample(self.tags, self.rng.randint(
+                1, min(3, len(self.tags))))
+            self.recipe_tags[pk] = [tag_id for tag_id, _ in tags]
+            date = self.start + step * position
+            self.recipes_by_author.setdefault(author, []).append((pk, date))
+            yield (pk, author, PLACEHOLDER_IMAGE,
+                   f'{self.rng.choice(ADJECTIVES).capitalize()} '
+                   f'{self.rng.choice(DISHES)} №{pk}',
+                   ' '.join(self.rng.choices(WORDS, k=30)),
+                   self.rng.randint(5, 180), self.adapt_date(date), '',
+                   sum(1 << bit for _, bit in tags), 0, 0)
+
+    def recipe_tag_rows(self):
+        ids = itertools.count(next_id(Recipe.tags.through))
+        for recipe_id, tag_ids in self.recipe_tags.items():
+            for tag_id in tag_ids:
+                yield next(ids), recipe_id, tag_id
+
+    def ingredient_rows(self, average):
+        ids = itertools.count(next_id(IngredientsOfRecipe))
+        limit = min(len(self.ingredient_ids), 2 * average)
+        for recipe_id in self.recipe_ids:
+            size = self.rng.randint(1, limit)
+            chosen = set(self.rng.choices(
+                self.ingredient_ids, cum_weights=self.ingredient_weights,
+                k=size))
+            for ingredient_id in chosen:
+                yield (next(ids), recipe_id, ingredient_id,
+                       self.rng.randint(1, 500))
+
+    def pairs(self, count, left, right, right_weights, distinct=False):
+        """
+        Уникальные пары (left, right).
+
+        left выбирается равномерно, right по весам популярности,
+        с distinct пары из одного и того же id пропускаются.
+        Если столько пар не набирается, возвращается сколько вышло.
+        """
+        seen = set()
+        for _ in range(count * 10):
+            if len(seen) >= count:
+                break
+            pair = (self.rng.choice(left),
+                    self.rng.choices(right, cum_weights=right_weights)[0])
+            if pair not in seen and not (distinct and pair[0] == pair[1]):
+                seen.add(pair)
+                yield pair
+
+    def user_recipe_rows(self, model, count):
+        ids = itertools.count(next_id(model))
+        recipes = list(self.recipe_ids)
+        self.rng.shuffle(recipes)
+        weights = zipf_cum_weights(len(recipes))
+        for user_id, recipe_id in self.pairs(
+                count, self.user_ids, recipes, weights):
+            yield next(ids), user_id, recipe_id
+
+    def subscription_rows(self, count):
+        ids = itertools.count(next_id(Subscription))
+        self.subscriptions = []
+        for subscriber_id, author_id in self.pairs(
+                count, self.user_ids, self.authors, self.author_weights,
+                distinct=True):
+            self.subscriptions.append((subscriber_id, author_id))
+            yield next(ids), author_id, subscriber_id
+
+    def feed_rows(self, celebrity_ids):
+        """Ленты подписчиков: последние рецепты каждого автора подписки."""
+        ids = itertools.count(next_id(FeedItem))
+        for subscriber_id, author_id in self.subscriptions:
+            if author_id in celebrity_ids:
+                continue
+            for recipe_id, date in self.recipes_by_author.get(
+                    author_id, ())[-FEED_BACKFILL_SIZE:]:
+                yield (next(ids), subscriber_id, recipe_id, author_id,
+                       self.adapt_date(date))
+
+    def tables(self, options):
+        """Таблицы в порядке записи: модель, поля и поток строк."""
+        return (
+            (User, ('id', 'password', 'is_superuser', 'username',
+                    'first_name', 'last_name', 'email', 'is_staff',
+                    'is_active', 'date_joined', 'followers_count',
+                    'recipes_count'),
+             lambda: self.users(options['users'])),
+            (Recipe, ('id', 'author', 'image', 'name', 'text',
+                      'cooking_time', 'date', 'variants_image', 'tags_mask',
+                      'favorites_count', 'carts_count'),
+             lambda: self.recipes(options['recipes'])),
+            (Recipe.tags.through, ('id', 'recipe', 'tag'),
+             self.recipe_tag_rows),
+            (IngredientsOfRecipe, ('id', 'recipe', 'ingredient', 'amount'),
+             lambda: self.ingredient_rows(options['ingredients_per_recipe'])),
+            (Favorite, ('id', 'user', 'recipe'),
+             lambda: self.user_recipe_rows(Favorite, options['favorites'])),
+            (Cart, ('id', 'user', 'recipe'),
+             lambda: self.user_recipe_rows(Cart, options['carts'])),
+            (Subscription, ('id', 'author', 'subscriber'),
+             lambda: self.subscription_rows(options['subscriptions'])),
+        )
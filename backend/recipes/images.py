@@ -0,0 +1,62 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from constants import IMAGE_FORMATS, IMAGE_QUALITY, IMAGE_VARIANTS
+
+VARIANTS_DIR = 'recipes/variants'
+JPEG_BACKGROUND = (255, 255, 255)
+
+
+def variant_name(image_name, variant, extension):
+    """
+    Путь варианта картинки в хранилище.
+
+    Каталог назван по исходному файлу, поэтому новая картинка
+    всегда получает новые адреса и их можно кэшировать навсегда.
+    """
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'{VARIANTS_DIR}/{stem}/{variant}.{extension}'
+
+
+def flatten(image):
+    """Картинка без прозрачности для форматов, которые ее не знают."""
+    if image.mode == 'RGB':
+        return image
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, JPEG_BACKGROUND)
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def encode(image, image_format):
+    """Сжимает картинку в байты нужного формата."""
+    if image_format == 'JPEG':
+        image = flatten(image)
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=IMAGE_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def render_variants(storage, image_name):
+    """
+    Сохраняет все размеры картинки во всех форматах.
+
+    Картинка только уменьшается с сохранением пропорций,
+    поворот из EXIF применяется заранее.
+    """
+    with storage.open(image_name) as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+    for variant, size in IMAGE_VARIANTS.items():
+        image = original.copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+        for extension, image_format in IMAGE_FORMATS.items():
+            name = variant_name(image_name, variant, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(encode(image, image_format)))
@@ -0,0 +1,65 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from api.probes import ProbeClient, endpoint_urls, get_samples
+from api.queryplans import PlanAudit, captured_selects
+from constants import QUERY_PLAN_MIN_ROWS
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    """Проверка планов запросов API на полное сканирование таблиц."""
+
+    help = ('Выполняет основные запросы API на текущей базе, снимает '
+            'их планы через EXPLAIN и завершается с ошибкой, если '
+            'большая таблица читается последовательным сканированием.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-rows', type=int, default=QUERY_PLAN_MIN_ROWS,
+            help='С какого числа строк таблица считается большой.')
+        parser.add_argument(
+            '--user', type=int,
+            help='id пользователя, от имени которого идут запросы.')
+
+    def captured_queries(self, client, urls):
+        for url in urls:
+            response, statements = captured_selects(client, url)
+            if response.status_code >= 500:
+                raise CommandError(f'{url}: ответ {response.status_code}.')
+            yield url, statements
+
+    def handle(self, *args, **options):
+        try:
+            audit = PlanAudit(options['min_rows'])
+        except ImproperlyConfigured as error:
+            raise CommandError(error)
+        samples = get_samples(options['user'])
+        if samples is None:
+            raise CommandError('База пуста, сначала заполните ее данными.')
+        queries = list(self.captured_queries(
+            ProbeClient(samples.user), endpoint_urls(samples)))
+        prefix = samples.ingredient.name[:2]
+        queries.append((f'ingredients name^={prefix}', [
+            Ingredient.objects.filter(
+                name__startswith=prefix).query.sql_with_params()]))
+        problems = 0
+        for url, statements in queries:
+            for sql, params in statements:
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{url}: {sql}')
+                large, exempt = audit.check(sql, params)
+                for table, reason in exempt:
+                    self.stdout.write(self.style.WARNING(
+                        f'{url}: полное сканирование {table} '
+                        f'допустимо: {reason}.'))
+                if large:
+                    problems += 1
+                    self.stdout.write(self.style.ERROR(
+                        f'{url}: полное сканирование '
+                        f'{", ".join(large)}\n    {sql}'))
+        if problems:
+            raise CommandError(f'Запросов с полным сканированием: {problems}.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено адресов: {len(queries)}, полных сканирований '
+            'больших таблиц нет.'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.tasks import build_image_variants
+
+
+class Command(BaseCommand):
+    """Подготовка вариантов картинок рецептов."""
+
+    help = ('Готовит уменьшенные копии картинок рецептов, для которых '
+            'их еще нет, например после потери фоновой задачи.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересобрать варианты и для уже готовых рецептов.')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').only(
+            'image', 'variants_image')
+        built = failed = 0
+        for recipe in recipes.iterator():
+            if recipe.has_image_variants and not options['all']:
+                continue
+            try:
+                build_image_variants(recipe.pk)
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'Рецепт {recipe.pk}: {error}')
+                continue
+            built += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово рецептов: {built}, с ошибками: {failed}.'))
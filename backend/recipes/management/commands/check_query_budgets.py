@@ -0,0 +1,66 @@
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import resolve
+from rest_framework.utils.urls import replace_query_param
+
+from api.probes import ProbeClient, endpoint_urls, get_samples
+from api.querystats import get_budget, track_queries
+from constants import MAX_PAGE_SIZE
+
+PAGE_SIZES = (1, MAX_PAGE_SIZE)
+
+
+class Command(BaseCommand):
+    """Проверка бюджетов запросов к базе из QUERY_BUDGETS."""
+
+    help = ('Запрашивает основные адреса API с наименьшим и наибольшим '
+            'размером страницы и завершается с ошибкой, если число '
+            'запросов к базе больше бюджета или растет с размером страницы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int,
+            help='id пользователя, от имени которого идут запросы.')
+
+    def measure(self, client, url):
+        """
+        Число запросов для каждого размера страницы.
+
+        Первый запрос прогревает кэши и не учитывается.
+        """
+        counts = []
+        for page_size in PAGE_SIZES:
+            page_url = replace_query_param(url, 'limit', page_size)
+            client.get(page_url)
+            with track_queries() as stats:
+                response = client.get(page_url)
+            if response.status_code >= 500:
+                raise CommandError(f'{url}: ответ {response.status_code}.')
+            counts.append(stats.count)
+        return counts
+
+    def check_url(self, client, url):
+        url_name = resolve(urlsplit(url).path).url_name
+        budget = get_budget('GET', url_name)
+        counts = self.measure(client, url)
+        line = f'{url} ({url_name}): {counts}, бюджет {budget}'
+        if budget is None:
+            self.stdout.write(self.style.WARNING(f'{line}, не задан'))
+            return True
+        if max(counts) > budget or counts[-1] > counts[0]:
+            self.stdout.write(self.style.ERROR(line))
+            return False
+        self.stdout.write(line)
+        return True
+
+    def handle(self, *args, **options):
+        samples = get_samples(options['user'])
+        if samples is None:
+            raise CommandError('База пуста, сначала заполните ее данными.')
+        client = ProbeClient(samples.user)
+        failed = [url for url in endpoint_urls(samples)
+                  if not self.check_url(client, url)]
+        if failed:
+            raise CommandError(f'Бюджет превышен: {len(failed)} адресов.')
+        self.stdout.write(self.style.SUCCESS('Все бюджеты соблюдены.'))
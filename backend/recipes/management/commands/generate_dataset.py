@@ -0,0 +1,82 @@
+import random
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.cache import RECIPES_SCOPE, bump_generation
+from recipes.counters import COUNTERS, reconcile_counter
+from recipes.dataset import Dataset, insert_rows, reset_sequences
+from recipes.models import CartIngredient, FeedItem, Ingredient, Recipe, Tag
+
+VOLUMES = (
+    ('users', 1000, 'Сколько пользователей создать.'),
+    ('recipes', 10000, 'Сколько рецептов создать.'),
+    ('ingredients-per-recipe', 8, 'Среднее число ингредиентов в рецепте.'),
+    ('favorites', 50000, 'Сколько добавлений в избранное создать.'),
+    ('carts', 10000, 'Сколько добавлений в корзины создать.'),
+    ('subscriptions', 20000, 'Сколько подписок создать.'),
+)
+
+
+class Command(BaseCommand):
+    """Заполнение базы синтетическими данными для нагрузочных тестов."""
+
+    help = ('Создает пользователей, рецепты, состав рецептов, избранное, '
+            'корзины и подписки с перекосом популярности по степенному '
+            'закону. Ингредиенты и тэги берутся из базы.')
+
+    def add_arguments(self, parser):
+        for name, default, help_text in VOLUMES:
+            parser.add_argument(f'--{name}', type=int, default=default,
+                                help=help_text)
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределить даты публикации.')
+        parser.add_argument(
+            '--seed', type=int, default=1,
+            help='Зерно генератора, при одном зерне данные одинаковые.')
+
+    def write(self, model, fields, rows):
+        start = time.monotonic()
+        count = insert_rows(model, fields, rows)
+        self.stdout.write(f'{model._meta.db_table}: {count} строк '
+                          f'за {time.monotonic() - start:.1f} с')
+
+    def refresh_derived(self, dataset):
+        """Счетчики, поисковый вектор и итоги корзин новых данных."""
+        first_ids = {Recipe: dataset.recipe_ids[0]}
+        for link_model, (model, _, _) in COUNTERS.items():
+            first = first_ids.get(model, dataset.user_ids[0])
+            reconcile_counter(link_model, model.objects.filter(
+                pk__gte=first).values('pk'))
+        Recipe.objects.filter(
+            pk__gte=first_ids[Recipe]).update_search_vector()
+        CartIngredient.objects.rebuild()
+
+    def handle(self, *args, **options):
+        tags = list(Tag.objects.values_list('id', 'bit'))
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if not tags or not ingredient_ids:
+            raise CommandError(
+                'Сначала загрузите ингредиенты и тэги: '
+                'python manage.py runscript my_script.')
+        if options['users'] < 2 or options['recipes'] < 1:
+            raise CommandError('Нужно хотя бы 2 пользователя и 1 рецепт.')
+        dataset = Dataset(random.Random(options['seed']), tags,
+                          ingredient_ids, options['days'])
+        start = time.monotonic()
+        with transaction.atomic():
+            tables = dataset.tables(options)
+            for model, fields, rows in tables:
+                self.write(model, fields, rows())
+            self.write(FeedItem, ('id', 'subscriber', 'recipe', 'author',
+                                  'date'), dataset.feed_rows(
+                FeedItem.objects.load_celebrity_author_ids()))
+            reset_sequences([model for model, _, _ in tables] + [FeedItem])
+            self.refresh_derived(dataset)
+        cache.delete(FeedItem.objects.celebrities_cache_key)
+        bump_generation(RECIPES_SCOPE)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - start:.1f} с.'))
@@ -0,0 +1,158 @@
+import itertools
+import json
+import random
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from api.loadtest import (HTTPSession, InProcessSession, Samples, Worker,
+                          assign_profiles, parse_mix, summarize)
+from constants import LOADTEST_CONCURRENCY, LOADTEST_DURATION, LOADTEST_MIX
+from recipes.models import User
+
+COMPARED_METRICS = ('rps', 'p50', 'p95', 'p99', 'queries_avg')
+
+
+def current_commit():
+    """Короткий хэш текущего коммита или None вне репозитория."""
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'), cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def merge_results(worker_results):
+    """Склеивает замеры всех воркеров по сценариям."""
+    merged = {}
+    for results in worker_results:
+        for name, samples in results.items():
+            merged.setdefault(name, []).extend(samples)
+    return merged
+
+
+class Command(BaseCommand):
+    """Нагрузочный прогон публичного API."""
+
+    help = ('Гоняет сценарии API в несколько потоков внутри процесса '
+            'или против запущенного сервера (--url) и печатает p50/p95/p99, '
+            'пропускную способность и число запросов к базе по сценариям. '
+            'Создает рецепты и меняет избранное и корзины, поэтому '
+            'запускается на тестовых данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=LOADTEST_CONCURRENCY,
+            help='Сколько виртуальных пользователей работает одновременно.')
+        parser.add_argument(
+            '--duration', type=float, default=LOADTEST_DURATION,
+            help='Длительность прогона в секундах.')
+        parser.add_argument(
+            '--requests', type=int,
+            help='Остановиться после стольких запросов всего.')
+        parser.add_argument(
+            '--mix', default=LOADTEST_MIX,
+            help='Доли профилей guest, reader и cook, например '
+                 'guest=30,reader=50,cook=20.')
+        parser.add_argument(
+            '--url',
+            help='Адрес запущенного сервера, например '
+                 'http://127.0.0.1:8000. Без него запросы идут внутри '
+                 'процесса.')
+        parser.add_argument('--seed', type=int, default=1,
+                            help='Зерно выбора сценариев и данных.')
+        parser.add_argument('--output',
+                            help='Файл для результатов в JSON.')
+        parser.add_argument(
+            '--compare',
+            help='JSON прошлого прогона для сравнения с текущим.')
+
+    def make_workers(self, options, samples):
+        try:
+            profiles = assign_profiles(parse_mix(options['mix']),
+                                       options['concurrency'])
+        except ValueError as error:
+            raise CommandError(error)
+        users = list(User.objects.filter(is_active=True).order_by('pk')[
+            :options['concurrency']])
+        if not users or not samples.recipe_ids or not samples.tags:
+            raise CommandError('База пуста, сначала запустите '
+                               'generate_dataset.')
+        workers = []
+        for index, profile in enumerate(profiles):
+            user = None if profile == 'guest' else users[index % len(users)]
+            session = (HTTPSession(user, options['url']) if options['url']
+                       else InProcessSession(user))
+            workers.append(Worker(profile, session, samples,
+                                  options['seed'] + index))
+        return workers
+
+    def run(self, workers, options):
+        budget = (itertools.count(options['requests'], -1)
+                  if options['requests'] else itertools.repeat(1))
+        start = time.monotonic()
+        deadline = start + options['duration']
+        with ThreadPoolExecutor(max_workers=len(workers)) as executor:
+            results = list(executor.map(
+                lambda worker: worker.run(deadline, budget), workers))
+        return merge_results(results), time.monotonic() - start
+
+    def report(self, results):
+        self.stdout.write(f'{"сценарий":<26}{"запр.":>7}{"ошиб.":>6}'
+                          f'{"rps":>8}{"p50":>8}{"p95":>8}{"p99":>8}'
+                          f'{"SQL":>6}')
+        for name, row in sorted(results.items()):
+            queries = row['queries_avg']
+            self.stdout.write(
+                f'{name:<26}{row["requests"]:>7}{row["errors"]:>6}'
+                f'{row["rps"]:>8}{row["p50"]:>8}{row["p95"]:>8}'
+                f'{row["p99"]:>8}{queries if queries is not None else "-":>6}')
+
+    def compare(self, path, results):
+        with open(path, encoding='utf8') as previous_file:
+            previous = json.load(previous_file)
+        self.stdout.write(
+            f'Сравнение с {path} (коммит {previous.get("commit")}):')
+        for name, row in sorted(results.items()):
+            old = previous['results'].get(name)
+            if old is None:
+                continue
+            changes = []
+            for metric in COMPARED_METRICS:
+                if old.get(metric) and row.get(metric) is not None:
+                    change = (row[metric] - old[metric]) / old[metric] * 100
+                    changes.append(f'{metric} {change:+.0f}%')
+            self.stdout.write(f'  {name}: {", ".join(changes)}')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        samples = Samples(random.Random(options['seed']))
+        workers = self.make_workers(options, samples)
+        started = timezone.now()
+        merged, elapsed = self.run(workers, options)
+        results = {name: summarize(rows, elapsed)
+                   for name, rows in merged.items()}
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf8') as output:
+                json.dump({
+                    'started': started.isoformat(),
+                    'commit': current_commit(),
+                    'target': options['url'] or 'in-process',
+                    'database': connection.vendor,
+                    'elapsed': round(elapsed, 2),
+                    'options': {key: options[key] for key in (
+                        'concurrency', 'duration', 'requests', 'mix',
+                        'seed')},
+                    'results': results,
+                }, output, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты записаны в {options["output"]}.')
+        if options['compare']:
+            self.compare(options['compare'], results)
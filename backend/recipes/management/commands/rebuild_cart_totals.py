@@ -0,0 +1,49 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import CartIngredient
+
+
+class Command(BaseCommand):
+    """Проверка и пересборка итогов корзин покупок."""
+
+    help = ('Сверяет таблицу итогов корзин с Cart и составом рецептов '
+            'и пересобирает ее.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только показать расхождения, ничего не менять.')
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='Ограничиться пользователем с этим id (можно повторять).')
+
+    def handle(self, *args, **options):
+        users = options['users']
+        expected = Counter({
+            (user_id, ingredient): total
+            for user_id, ingredient, total
+            in CartIngredient.objects.expected(users).iterator()})
+        stored = CartIngredient.objects.filter(total_amount__gt=0)
+        if users is not None:
+            stored = stored.filter(user_id__in=users)
+        actual = Counter({
+            (user_id, ingredient): total
+            for user_id, ingredient, total in stored.values_list(
+                'user_id', 'ingredient_id', 'total_amount').iterator()})
+        drift = {key for key in expected.keys() | actual.keys()
+                 if expected[key] != actual[key]}
+        for user_id, ingredient in sorted(drift)[:options['verbosity'] * 20]:
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient}: '
+                f'ожидается {expected[user_id, ingredient]}, '
+                f'в таблице {actual[user_id, ingredient]}')
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+            return
+        if options['check']:
+            raise CommandError(f'Расхождений: {len(drift)}.')
+        CartIngredient.objects.rebuild(users)
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено расхождений: {len(drift)}.'))
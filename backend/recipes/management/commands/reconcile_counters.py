@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.counters import COUNTERS, counter_drift, reconcile_counter
+
+
+class Command(BaseCommand):
+    """Сверка счетчиков популярности с настоящими связями."""
+
+    help = ('Сверяет счетчики избранного, корзин, подписчиков и рецептов '
+            'с таблицами связей и исправляет расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только показать расхождения, ничего не менять.')
+
+    def handle(self, *args, **options):
+        total = 0
+        for link_model, (model, field, _) in COUNTERS.items():
+            with transaction.atomic():
+                drift = list(counter_drift(link_model))
+                for pk, stored, actual in drift[:options['verbosity'] * 20]:
+                    self.stdout.write(
+                        f'{model.__name__}.{field} id={pk}: '
+                        f'в счетчике {stored}, на самом деле {actual}')
+                if drift and not options['check']:
+                    reconcile_counter(link_model, [row[0] for row in drift])
+            total += len(drift)
+        if not total:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+            return
+        if options['check']:
+            raise CommandError(f'Расхождений: {total}.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено расхождений: {total}.'))
@@ -0,0 +1,14 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_auto_20231008_1526'),
+    ]
+
+    operations = [
+        migrations.RenameModel('Recipes', 'Recipe'),
+        migrations.RenameModel('Tags', 'Tag'),
+        migrations.RenameModel('Subscriptions', 'Subscription'),
+    ]
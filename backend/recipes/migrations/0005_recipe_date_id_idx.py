@@ -0,0 +1,17 @@
+# Generated by Django 3.2.16 on 2026-10-17 02:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_auto_20261017_0229'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-date', '-id'], name='recipe_date_id_idx'),
+        ),
+    ]
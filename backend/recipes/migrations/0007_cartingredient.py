@@ -0,0 +1,53 @@
+# Generated by Django 3.2.16 on 2026-10-17 02:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_cart_totals(apps, schema_editor):
+    Cart = apps.get_model('recipes', 'Cart')
+    CartIngredient = apps.get_model('recipes', 'CartIngredient')
+    totals = Cart.objects.filter(
+        recipe__ingredients_in_recipe__isnull=False
+    ).values(
+        'user_id', 'recipe__ingredients_in_recipe__ingredient_id'
+    ).annotate(
+        total=models.Sum('recipe__ingredients_in_recipe__amount')
+    ).values_list(
+        'user_id', 'recipe__ingredients_in_recipe__ingredient_id', 'total'
+    ).order_by()
+    CartIngredient.objects.bulk_create(
+        (CartIngredient(user_id=user_id, ingredient_id=ingredient_id,
+                        total_amount=total)
+         for user_id, ingredient_id, total in totals.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.IntegerField(default=0, verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_totals', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_ingredients', to=settings.AUTH_USER_MODEL, verbose_name='Владелец корзины')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент в корзине',
+                'verbose_name_plural': 'Ингредиенты в корзине',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cartingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='cart_ingredient'),
+        ),
+        migrations.RunPython(fill_cart_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-17 04:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_cartingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='variants_image',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Картинка, для которой готовы варианты'),
+        ),
+    ]
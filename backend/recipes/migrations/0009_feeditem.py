@@ -0,0 +1,67 @@
+# Generated by Django 3.2.16 on 2026-10-17 02:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from constants import FEED_BACKFILL_SIZE, FEED_BATCH_SIZE
+
+
+def fill_feeds(apps, schema_editor):
+    Subscription = apps.get_model('recipes', 'Subscription')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedItem = apps.get_model('recipes', 'FeedItem')
+    followers = {}
+    for author_id, subscriber_id in Subscription.objects.values_list(
+            'author_id', 'subscriber_id').iterator():
+        followers.setdefault(author_id, []).append(subscriber_id)
+    for author_id, subscriber_ids in followers.items():
+        if len(subscriber_ids) > settings.FEED_FANOUT_LIMIT:
+            continue
+        recipes = list(Recipe.objects.filter(author_id=author_id).order_by(
+            '-date', '-id').values_list('id', 'date')[:FEED_BACKFILL_SIZE])
+        FeedItem.objects.bulk_create(
+            (FeedItem(subscriber_id=subscriber_id, recipe_id=recipe_id,
+                      author_id=author_id, date=date)
+             for subscriber_id in subscriber_ids
+             for recipe_id, date in recipes),
+            batch_size=FEED_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_variants_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='recipes.recipe', verbose_name='Рецепт')),
+                ('subscriber', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Рецепт в ленте',
+                'verbose_name_plural': 'Ленты подписчиков',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['subscriber', '-date', '-recipe'], name='feed_subscriber_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['subscriber', 'author'], name='feed_subscriber_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feeditem',
+            constraint=models.UniqueConstraint(fields=('subscriber', 'recipe'), name='feed_subscriber_recipe'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
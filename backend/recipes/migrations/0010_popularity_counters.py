@@ -0,0 +1,59 @@
+# Generated by Django 3.2.16 on 2026-10-17 02:47
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('Recipe', 'favorites_count', 'Favorite', 'recipe'),
+    ('Recipe', 'carts_count', 'Cart', 'recipe'),
+    ('User', 'followers_count', 'Subscription', 'author'),
+    ('User', 'recipes_count', 'Recipe', 'author'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for model_name, field, link_model_name, link_field in COUNTERS:
+        model = apps.get_model('recipes', model_name)
+        link_model = apps.get_model('recipes', link_model_name)
+        model.objects.update(**{field: Coalesce(Subquery(
+            link_model.objects.filter(
+                **{link_field: OuterRef('pk')}
+            ).order_by().values(link_field).annotate(
+                total=Count('pk')
+            ).values('total')), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_feeditem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='carts_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='В корзинах'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Число подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Число рецептов'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-date', '-id'], name='recipe_popular_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.16 on 2026-10-17 03:40
+
+from django.db import migrations, models
+
+CATALOGS = ('recipes.tag', 'recipes.ingredient')
+
+
+def create_versions(apps, schema_editor):
+    CatalogVersion = apps.get_model('recipes', 'CatalogVersion')
+    CatalogVersion.objects.bulk_create(
+        [CatalogVersion(scope=scope) for scope in CATALOGS])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('scope', models.CharField(max_length=150, primary_key=True, serialize=False, verbose_name='Справочник')),
+                ('version', models.PositiveBigIntegerField(default=1, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия справочника',
+                'verbose_name_plural': 'Версии справочников',
+            },
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.16 on 2026-10-17 03:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_catalog_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['followers_count'], name='user_followers_count_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.16 on 2026-10-17 04:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_user_followers_count_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['tags_mask'], name='recipe_tags_mask_idx'),
+        ),
+    ]
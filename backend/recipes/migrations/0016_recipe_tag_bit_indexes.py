@@ -0,0 +1,41 @@
+# Generated by Django 3.2.16 on 2026-10-17 12:10
+
+from django.db import migrations
+
+from constants import MAX_TAG_BITS
+
+
+def create_tag_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS recipe_tags_mask_idx '
+            'ON recipes_recipe (tags_mask)')
+        return
+    for bit in range(MAX_TAG_BITS):
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS recipe_tag_bit_{bit}_idx '
+            f'ON recipes_recipe (date DESC, id DESC) '
+            f'WHERE (tags_mask & {1 << bit}) > 0')
+
+
+def drop_tag_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS recipe_tags_mask_idx')
+        return
+    for bit in range(MAX_TAG_BITS):
+        schema_editor.execute(f'DROP INDEX IF EXISTS recipe_tag_bit_{bit}_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_recipe_tags_mask_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='recipe_tags_mask_idx',
+        ),
+        migrations.RunPython(create_tag_indexes, drop_tag_indexes),
+    ]
@@ -1,17 +1,44 @@
+import re
+from functools import reduce
+from operator import and_, or_
+
 from colorfield.fields import ColorField
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, SearchVectorField,
+                                            TrigramSimilarity)
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import F, Q
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import (Case, Exists, F, Func, OuterRef, Prefetch, Q,
+                              Subquery, Sum, Value, When, Window)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 
 from api.validator import cooking_time_validator
-from constants import MAX_LENGHT_COLOR, MAX_LENGHT_NAME, MAX_LENGHT_TEXT
+from constants import (CART_TOTALS_BATCH_SIZE, FEED_BACKFILL_SIZE,
+                       FEED_BATCH_SIZE, MAX_LENGHT_COLOR, MAX_LENGHT_NAME,
+                       MAX_LENGHT_TEXT, MAX_TAG_BITS, SEARCH_CONFIG)
+
+from .images import variant_name
 from .validator import validator_more_one
 
 UsernameValidator = UnicodeUsernameValidator()
 
 
+def casefold_pattern(text):
+    """
+    Регулярное выражение для поиска подстроки без учета регистра и ё.
+
+    lower() в SQLite понимает только латиницу, а регулярные выражения
+    Django выполняет в Python, где (?i) работает и для кириллицы.
+    """
+    return re.sub('[её]', '[её]', re.escape(text.strip().lower()))
+
+
 class User(AbstractUser):
     """Модель пользователя."""
 
@@ -41,11 +68,23 @@ class User(AbstractUser):
         verbose_name='Пароль',
         max_length=MAX_LENGHT_NAME,
     )
+    followers_count = models.IntegerField(
+        verbose_name='Число подписчиков',
+        default=0,
+        editable=False,
+    )
+    recipes_count = models.IntegerField(
+        verbose_name='Число рецептов',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
         ordering = ('id',)
+        indexes = [models.Index(fields=('followers_count',),
+                                name='user_followers_count_idx')]
 
     def __str__(self):
         return f'{self.username}'
@@ -117,6 +156,11 @@ class Tag(models.Model):
         null=False,
         max_length=MAX_LENGHT_NAME
     )
+    bit = models.PositiveSmallIntegerField(
+        verbose_name='Бит в маске тэгов рецепта',
+        unique=True,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Тег'
@@ -126,6 +170,35 @@ class Tag(models.Model):
     def __str__(self):
         return f'{self.name}'
 
+    @property
+    def mask(self):
+        """Маска с одним битом этого тэга."""
+        return 1 << self.bit
+
+    def save(self, *args, **kwargs):
+        """
+        Новому тэгу достается первый свободный бит маски.
+
+        Если тот же бит одновременно занял другой тэг, уникальность
+        поля не даст записать дубль, и бит выбирается заново.
+        """
+        if self.bit is not None:
+            return super().save(*args, **kwargs)
+        while True:
+            used = set(Tag.objects.values_list('bit', flat=True))
+            free = [bit for bit in range(MAX_TAG_BITS) if bit not in used]
+            if not free:
+                raise ValidationError(
+                    f'Тэгов не может быть больше {MAX_TAG_BITS}.')
+            self.bit = free[0]
+            try:
+                with transaction.atomic(using=kwargs.get('using')):
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                self.bit = None
+                if not Tag.objects.filter(bit=free[0]).exists():
+                    raise
+
 
 class Ingredient(models.Model):
     """Ингредиенты."""
@@ -146,11 +219,205 @@ class Ingredient(models.Model):
         constraints = [models.UniqueConstraint(fields=['name',
                                                        'measurement_unit'],
                                                name='name_measurement_unit')]
+        indexes = [models.Index(fields=('name',),
+                                name='ingredient_name_prefix_idx',
+                                opclasses=('varchar_pattern_ops',))]
 
     def __str__(self):
         return f'{self.name} {self.measurement_unit}'
 
 
+class CatalogVersionManager(models.Manager):
+    """Версии справочников, общие для всех процессов через базу."""
+
+    @staticmethod
+    def scope(model):
+        return model._meta.label_lower
+
+    def bump(self, model):
+        """Сдвигает версию справочника в текущей транзакции."""
+        scope = self.scope(model)
+        if not self.filter(scope=scope).update(version=F('version') + 1):
+            self.get_or_create(scope=scope)
+
+    def current(self, model):
+        """
+        Версия данных справочника одним запросом.
+
+        Сохранения и удаления сдвигают счетчик через сигналы,
+        наибольший id замечает bulk_create, который сигналов не шлет.
+        """
+        last = model.objects.order_by().values(
+            last=Func(F('pk'), function='MAX'))
+        row = self.filter(scope=self.scope(model)).annotate(
+            last=Subquery(last)).values_list('version', 'last').first()
+        version, last = row or (0, None)
+        return f'{version}-{last or 0}'
+
+
+class CatalogVersion(models.Model):
+    """Счетчик изменений справочника."""
+
+    scope = models.CharField(
+        verbose_name='Справочник',
+        primary_key=True,
+        max_length=MAX_LENGHT_NAME
+    )
+    version = models.PositiveBigIntegerField(
+        verbose_name='Версия',
+        default=1
+    )
+
+    objects = CatalogVersionManager()
+
+    class Meta:
+        verbose_name = 'Версия справочника'
+        verbose_name_plural = 'Версии справочников'
+
+    def __str__(self):
+        return f'{self.scope} v{self.version}'
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Кверисет рецептов с данными для текущего пользователя."""
+
+    def with_viewer_flags(self, user):
+        """Аннотирует отметки избранного и корзины пользователя."""
+        if not user.is_authenticated:
+            return self.annotate(is_favorited=Value(False),
+                                 is_in_shopping_cart=Value(False))
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(Cart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+        )
+
+    def with_related(self, user):
+        """Подгружает автора, тэги и ингредиенты без N+1 запросов."""
+        authors = User.objects.all()
+        if user.is_authenticated:
+            authors = authors.annotate(is_subscribed=Exists(
+                Subscription.objects.filter(author=OuterRef('pk'),
+                                            subscriber=user)))
+        else:
+            authors = authors.annotate(is_subscribed=Value(False))
+        return self.prefetch_related(
+            Prefetch('author', queryset=authors),
+            'tags',
+            Prefetch('ingredients_in_recipe',
+                     queryset=IngredientsOfRecipe.objects.select_related(
+                         'ingredient')),
+        )
+
+    def for_viewer(self, user):
+        """Полный набор данных для выдачи рецептов пользователю."""
+        return self.with_viewer_flags(user).with_related(user).defer(
+            'search_vector')
+
+    def with_tags(self, mask, match_all=False):
+        """
+        Рецепты с любым или со всеми тэгами из маски.
+
+        Каждый тэг проверяется отдельным условием (tags_mask & бит) > 0,
+        без JOIN и дублей. В PostgreSQL оно совпадает с условием
+        частичного индекса recipe_tag_bit_N_idx из миграции 0016.
+        """
+        bits = [1 << bit for bit in range(MAX_TAG_BITS) if mask >> bit & 1]
+        if not bits:
+            return self.all() if match_all else self.none()
+        queryset = self.alias(**{f'tag_bit_{bit}': F('tags_mask').bitand(bit)
+                                 for bit in bits})
+        conditions = [Q(**{f'tag_bit_{bit}__gt': 0}) for bit in bits]
+        return queryset.filter(reduce(and_ if match_all else or_, conditions))
+
+    def refresh_tags_mask(self):
+        """Пересчитывает маску тэгов выбранных рецептов."""
+        masks = dict.fromkeys(self.values_list('pk', flat=True), 0)
+        for recipe_id, bit in Recipe.tags.through.objects.filter(
+                recipe_id__in=masks).values_list('recipe_id', 'tag__bit'):
+            masks[recipe_id] |= 1 << bit
+        Recipe.objects.bulk_update(
+            [Recipe(pk=pk, tags_mask=mask) for pk, mask in masks.items()],
+            ('tags_mask',), batch_size=CART_TOTALS_BATCH_SIZE)
+
+    def top_per_author(self, limit=None):
+        """
+        Первые limit свежих рецептов каждого автора одним запросом.
+
+        limit=None - все рецепты, limit=0 - ни одного.
+
+        Номер рецепта у автора считает ROW_NUMBER() OVER (PARTITION BY
+        author), отбор по нему идет во внешнем запросе.
+        """
+        queryset = self.order_by('-date', '-id')
+        if limit is None:
+            return queryset
+        if limit == 0:
+            return queryset.none()
+        ranked = self.annotate(author_position=Window(
+            RowNumber(),
+            partition_by=F('author_id'),
+            order_by=(F('date').desc(), F('id').desc()),
+        )).order_by().values('id', 'author_position')
+        sql, params = ranked.query.sql_with_params()
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) ranked '
+            f'WHERE ranked.author_position <= %s',
+            (*params, limit)))
+
+    @property
+    def is_postgresql(self):
+        return connections[self.db].vendor == 'postgresql'
+
+    def update_search_vector(self):
+        """
+        Пересчитывает поисковый вектор рецептов.
+
+        Вес A у названия, B у ингредиентов, C у текста.
+        Вне PostgreSQL вектор не используется и не считается.
+        """
+        if not self.is_postgresql:
+            return 0
+        ingredient_names = IngredientsOfRecipe.objects.filter(
+            recipe=OuterRef('pk')).values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')).values('names')
+        return self.update(search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector(Subquery(ingredient_names), weight='B',
+                           config=SEARCH_CONFIG)
+            + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+        ))
+
+    def search(self, text):
+        """
+        Поиск по названию, тексту и ингредиентам с ранжированием.
+
+        В PostgreSQL работает по tsvector и триграммам названия,
+        в остальных базах по подстроке без учета регистра и ё
+        для разработки.
+        """
+        if self.is_postgresql:
+            query = SearchQuery(text, config=SEARCH_CONFIG,
+                                search_type='websearch')
+            return self.filter(
+                Q(search_vector=query) | Q(name__trigram_similar=text)
+            ).annotate(
+                search_rank=(SearchRank(F('search_vector'), query)
+                             + TrigramSimilarity('name', text))
+            ).order_by('-search_rank', '-date')
+        pattern = casefold_pattern(text)
+        return self.filter(
+            Q(name__iregex=pattern)
+            | Q(text__iregex=pattern)
+            | Exists(IngredientsOfRecipe.objects.filter(
+                recipe=OuterRef('pk'), ingredient__name__iregex=pattern))
+        ).annotate(
+            search_rank=Case(When(name__iregex=pattern, then=Value(1)),
+                             default=Value(0))
+        ).order_by('-search_rank', '-date')
+
+
 class Recipe(models.Model):
     """Рецепт."""
 
@@ -195,15 +462,61 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+    variants_image = models.CharField(
+        verbose_name='Картинка, для которой готовы варианты',
+        max_length=100,
+        blank=True,
+        editable=False,
+    )
+    tags_mask = models.BigIntegerField(
+        verbose_name='Маска тэгов',
+        default=0,
+        editable=False,
+    )
+    favorites_count = models.IntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False,
+    )
+    carts_count = models.IntegerField(
+        verbose_name='В корзинах',
+        default=0,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-date',)
+        indexes = [models.Index(fields=('-date', '-id'),
+                                name='recipe_date_id_idx'),
+                   models.Index(fields=('-favorites_count', '-date', '-id'),
+                                name='recipe_popular_idx'),
+                   models.Index(fields=('author', '-date', '-id'),
+                                name='recipe_author_date_idx')]
 
     def __str__(self):
         return f'{self.name}'
 
+    @property
+    def has_image_variants(self):
+        """Готовы ли варианты для текущей картинки."""
+        return bool(self.image) and self.variants_image == self.image.name
+
+    def image_variant_url(self, variant, extension):
+        """Адрес варианта картинки или None, пока он не готов."""
+        if not self.has_image_variants:
+            return None
+        return self.image.storage.url(
+            variant_name(self.image.name, variant, extension))
+
 
 class IngredientsOfRecipe(models.Model):
     """Ингредиенты в рецепте."""
@@ -284,3 +597,236 @@ class Cart(models.Model):
 
     def __str__(self):
         return f'{self.user}-{self.recipe}'
+
+
+class CartIngredientManager(models.Manager):
+    """Поддержка итогов корзины дельтами вместо пересчета."""
+
+    def apply_deltas(self, user_ids, deltas):
+        """
+        Прибавляет к итогам пользователей изменения по ингредиентам.
+
+        Недостающие строки создаются одним bulk_create, изменение
+        делается одним UPDATE, обнулившиеся строки удаляются.
+        """
+        user_ids = list(user_ids)
+        deltas = {ingredient: amount
+                  for ingredient, amount in deltas.items() if amount}
+        if not user_ids or not deltas:
+            return
+        self.bulk_create(
+            [self.model(user_id=user_id, ingredient_id=ingredient,
+                        total_amount=0)
+             for user_id in user_ids
+             for ingredient, amount in deltas.items() if amount > 0],
+            batch_size=CART_TOTALS_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        rows = self.filter(user_id__in=user_ids, ingredient_id__in=deltas)
+        rows.update(total_amount=F('total_amount') + Case(
+            *(When(ingredient_id=ingredient, then=Value(amount))
+              for ingredient, amount in deltas.items()),
+            default=Value(0),
+        ))
+        rows.filter(total_amount__lte=0).delete()
+
+    @staticmethod
+    def recipe_amounts(recipe_ids):
+        """Суммарное количество ингредиентов в наборе рецептов."""
+        return dict(IngredientsOfRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values('ingredient_id').annotate(
+            total=Sum('amount')
+        ).values_list('ingredient_id', 'total'))
+
+    def add_recipes(self, user, recipe_ids):
+        """Рецепты добавлены в корзину пользователя."""
+        self.apply_deltas((user.pk,), self.recipe_amounts(recipe_ids))
+
+    def remove_recipes(self, user, recipe_ids):
+        """Рецепты убраны из корзины пользователя."""
+        self.apply_deltas((user.pk,), {
+            ingredient: -amount for ingredient, amount
+            in self.recipe_amounts(recipe_ids).items()})
+
+    def change_recipe(self, recipe, old_amounts, new_amounts):
+        """Состав рецепта изменился у всех, у кого он в корзине."""
+        deltas = {
+            ingredient: (new_amounts.get(ingredient, 0)
+                         - old_amounts.get(ingredient, 0))
+            for ingredient in old_amounts.keys() | new_amounts.keys()}
+        self.apply_deltas(
+            Cart.objects.filter(recipe=recipe).values_list(
+                'user_id', flat=True), deltas)
+
+    def expected(self, user_ids=None):
+        """Итоги корзин, посчитанные заново из Cart и состава рецептов."""
+        carts = Cart.objects.all()
+        if user_ids is not None:
+            carts = carts.filter(user_id__in=user_ids)
+        return carts.filter(
+            recipe__ingredients_in_recipe__isnull=False
+        ).values(
+            'user_id', 'recipe__ingredients_in_recipe__ingredient_id'
+        ).annotate(
+            total=Sum('recipe__ingredients_in_recipe__amount')
+        ).values_list(
+            'user_id', 'recipe__ingredients_in_recipe__ingredient_id', 'total'
+        ).order_by()
+
+    def rebuild(self, user_ids=None):
+        """Полностью пересобирает итоги корзин."""
+        with transaction.atomic():
+            rows = self.all()
+            if user_ids is not None:
+                rows = rows.filter(user_id__in=user_ids)
+            rows.delete()
+            self.bulk_create(
+                (self.model(user_id=user_id, ingredient_id=ingredient,
+                            total_amount=total)
+                 for user_id, ingredient, total in self.expected(
+                     user_ids).iterator()),
+                batch_size=CART_TOTALS_BATCH_SIZE,
+            )
+
+
+class CartIngredient(models.Model):
+    """Итоговое количество ингредиента в корзине пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Владелец корзины',
+        related_name='cart_ingredients'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+        related_name='cart_totals'
+    )
+    total_amount = models.IntegerField(
+        verbose_name='Количество',
+        default=0,
+    )
+
+    objects = CartIngredientManager()
+
+    class Meta:
+        verbose_name = 'Ингредиент в корзине'
+        verbose_name_plural = 'Ингредиенты в корзине'
+        constraints = [models.UniqueConstraint(fields=['user', 'ingredient'],
+                                               name='cart_ingredient')]
+
+    def __str__(self):
+        return f'{self.user}-{self.ingredient} {self.total_amount}'
+
+
+class FeedItemManager(models.Manager):
+    """Рассылка рецептов по лентам подписчиков."""
+
+    celebrities_cache_key = 'feed:celebrity-authors'
+
+    @staticmethod
+    def load_celebrity_author_ids():
+        """Авторы, у которых подписчиков больше FEED_FANOUT_LIMIT."""
+        return frozenset(User.objects.filter(
+            followers_count__gt=settings.FEED_FANOUT_LIMIT
+        ).values_list('pk', flat=True).order_by())
+
+    def celebrity_author_ids(self):
+        """
+        Авторы, рецепты которых не рассылаются по лентам.
+
+        Их рецепты подмешиваются в ленту при чтении.
+        Список общий для рассылки и чтения и кэшируется.
+        """
+        return cache.get_or_set(
+            self.celebrities_cache_key, self.load_celebrity_author_ids,
+            settings.FEED_CELEBRITY_CACHE_TIMEOUT)
+
+    def fan_out(self, recipe):
+        """Кладет рецепт в ленты всех подписчиков автора."""
+        if recipe.author_id in self.celebrity_author_ids():
+            return
+        self.bulk_create(
+            [self.model(subscriber_id=subscriber_id, recipe=recipe,
+                        author_id=recipe.author_id, date=recipe.date)
+             for subscriber_id in Subscription.objects.filter(
+                 author_id=recipe.author_id).values_list(
+                     'subscriber_id', flat=True).iterator()],
+            batch_size=FEED_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    def backfill(self, subscriber_id, author_ids):
+        """
+        Добавляет в ленту последние рецепты авторов.
+
+        Берутся только авторы, подписка на которых еще есть,
+        по FEED_BACKFILL_SIZE рецептов каждого одним запросом.
+        """
+        author_ids = set(Subscription.objects.filter(
+            subscriber_id=subscriber_id, author_id__in=author_ids,
+        ).values_list('author_id', flat=True))
+        author_ids -= self.celebrity_author_ids()
+        if not author_ids:
+            return
+        self.bulk_create(
+            [self.model(subscriber_id=subscriber_id, recipe_id=pk,
+                        author_id=author_id, date=date)
+             for pk, author_id, date in Recipe.objects.filter(
+                 author_id__in=author_ids).top_per_author(
+                     FEED_BACKFILL_SIZE).values_list('id', 'author_id',
+                                                     'date')],
+            batch_size=FEED_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    def trim(self, subscriber_id, author_ids):
+        """Убирает из ленты рецепты авторов, от которых отписались."""
+        self.filter(subscriber_id=subscriber_id,
+                    author_id__in=author_ids).delete()
+
+
+class FeedItem(models.Model):
+    """Рецепт в ленте подписчика."""
+
+    subscriber = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Подписчик',
+        related_name='feed_items'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='feed_items'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Автор',
+        related_name='+'
+    )
+    date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    objects = FeedItemManager()
+
+    class Meta:
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Ленты подписчиков'
+        constraints = [models.UniqueConstraint(fields=['subscriber', 'recipe'],
+                                               name='feed_subscriber_recipe')]
+        indexes = [
+            models.Index(fields=('subscriber', '-date', '-recipe'),
+                         name='feed_subscriber_date_idx'),
+            models.Index(fields=('subscriber', 'author'),
+                         name='feed_subscriber_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.subscriber}-{self.recipe}'
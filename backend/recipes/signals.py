@@ -0,0 +1,82 @@
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+
+from .counters import change_counter
+from .models import (Cart, CartIngredient, CatalogVersion, Ingredient,
+                     IngredientsOfRecipe, Recipe, Tag)
+from .tasks import build_image_variants, submit
+
+VARIANT_FIELDS = frozenset(('variants_image',))
+
+
+def refresh_search_vector(recipes):
+    """Пересчитывает поисковый вектор рецептов после фиксации транзакции."""
+    transaction.on_commit(recipes.update_search_vector)
+
+
+def recipe_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Рецепт изменился, новой картинке нужны варианты."""
+    if created:
+        change_counter(Recipe, (instance.author_id,), 1)
+    if update_fields is None or set(update_fields) - VARIANT_FIELDS:
+        refresh_search_vector(Recipe.objects.filter(pk=instance.pk))
+    if instance.image and not instance.has_image_variants:
+        transaction.on_commit(
+            lambda: submit(build_image_variants, instance.pk))
+
+
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    """Изменился состав рецепта."""
+    refresh_search_vector(Recipe.objects.filter(pk=instance.recipe_id))
+
+
+def ingredient_saved(sender, instance, created, **kwargs):
+    """Переименованный ингредиент меняет вектор всех его рецептов."""
+    if not created:
+        refresh_search_vector(Recipe.objects.filter(ingredients=instance))
+
+
+def recipe_deleting(sender, instance, **kwargs):
+    """Удаляемый рецепт уходит из итогов корзин, пока состав еще есть."""
+    change_counter(Recipe, (instance.author_id,), -1)
+    amounts = CartIngredient.objects.recipe_amounts((instance.pk,))
+    CartIngredient.objects.apply_deltas(
+        Cart.objects.filter(recipe=instance).values_list(
+            'user_id', flat=True),
+        {ingredient: -amount for ingredient, amount in amounts.items()})
+
+
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Тэги рецептов изменились, маски пересчитываются в той же транзакции."""
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        recipes = Recipe.objects.filter(pk=instance.pk)
+    elif pk_set:
+        recipes = Recipe.objects.filter(pk__in=pk_set)
+    else:
+        recipes = Recipe.objects.with_tags(instance.mask)
+    recipes.refresh_tags_mask()
+
+
+def catalog_changed(sender, **kwargs):
+    """Справочник изменился, его версия сдвигается в той же транзакции."""
+    CatalogVersion.objects.bump(sender)
+
+
+def tag_deleted(sender, instance, **kwargs):
+    """Бит удаленного тэга убирается из масок рецептов."""
+    Recipe.objects.with_tags(instance.mask).refresh_tags_mask()
+
+
+post_save.connect(recipe_saved, sender=Recipe)
+post_save.connect(recipe_ingredient_changed, sender=IngredientsOfRecipe)
+post_delete.connect(recipe_ingredient_changed, sender=IngredientsOfRecipe)
+post_save.connect(ingredient_saved, sender=Ingredient)
+pre_delete.connect(recipe_deleting, sender=Recipe)
+m2m_changed.connect(recipe_tags_changed, sender=Recipe.tags.through)
+post_delete.connect(tag_deleted, sender=Tag)
+for catalog in (Tag, Ingredient):
+    post_save.connect(catalog_changed, sender=catalog)
+    post_delete.connect(catalog_changed, sender=catalog)
@@ -0,0 +1,17 @@
+'use strict';
+{
+    const $ = django.jQuery;
+
+    $(function() {
+        $('.autocomplete-filter select').on('change', function() {
+            const url = new URL(window.location.href);
+            url.searchParams.delete('p');
+            if (this.value) {
+                url.searchParams.set(this.name, this.value);
+            } else {
+                url.searchParams.delete(this.name);
+            }
+            window.location.href = url.toString();
+        });
+    });
+}
@@ -0,0 +1,71 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+from .images import render_variants
+from .models import FeedItem, Recipe
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Общий на процесс пул фоновых задач, создается при первой задаче."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_WORKERS,
+                thread_name_prefix='foodgram-background')
+    return _executor
+
+
+def run_task(func, *args):
+    """Выполняет задачу и закрывает соединения с базой ее потока."""
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Фоновая задача %s упала', func.__name__)
+    finally:
+        connections.close_all()
+
+
+def submit(func, *args):
+    """
+    Ставит задачу в фоновый пул.
+
+    При BACKGROUND_WORKERS = 0 задача выполняется сразу,
+    это удобно для отладки и управляющих команд.
+    """
+    if not settings.BACKGROUND_WORKERS:
+        func(*args)
+        return
+    get_executor().submit(run_task, func, *args)
+
+
+def build_image_variants(recipe_id):
+    """Готовит варианты картинки рецепта и отмечает их готовность."""
+    recipe = Recipe.objects.filter(pk=recipe_id).only('image').first()
+    if recipe is None or not recipe.image:
+        return
+    render_variants(recipe.image.storage, recipe.image.name)
+    recipe.variants_image = recipe.image.name
+    recipe.save(update_fields=('variants_image',))
+
+
+def fan_out_recipe(recipe_id):
+    """Рассылает новый рецепт по лентам подписчиков автора."""
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'id', 'author_id', 'date').first()
+    if recipe is not None:
+        FeedItem.objects.fan_out(recipe)
+
+
+def backfill_feed(subscriber_id, author_ids):
+    """Заполняет ленту рецептами авторов после подписки."""
+    FeedItem.objects.backfill(subscriber_id, author_ids)
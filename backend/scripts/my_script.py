@@ -27,14 +27,8 @@ def run():
             data.append(obj)
         Ingredient.objects.bulk_create(data)
 
-    tags_data = []
-    for i in range(3):
-        obj = Tag()
-        obj.name = TAGS_NAMES[i]
-        obj.slug = TAGS_SLUG[i]
-        obj.color = TAGS_COLORS[i]
-        tags_data.append(obj)
-    Tag.objects.bulk_create(tags_data)
+    for name, slug, color in zip(TAGS_NAMES, TAGS_SLUG, TAGS_COLORS):
+        Tag.objects.create(name=name, slug=slug, color=color)
 
     superuser = User.objects.create_superuser(username='admin',
                                               email='admin@admin.com',
@@ -0,0 +1,38 @@
+import pytest
+from django.core.management import call_command
+
+from api.probes import ProbeClient, get_samples
+from scripts.my_script import run as fill_catalogs
+
+DATASET = {
+    'users': 300,
+    'recipes': 1500,
+    'favorites': 5000,
+    'carts': 1500,
+    'subscriptions': 1500,
+}
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup, django_db_blocker):
+    """
+    Справочники и синтетические данные один раз на всю сессию.
+
+    Таблиц больше QUERY_PLAN_MIN_ROWS строк хватает, чтобы
+    планы запросов были как на живой базе.
+    """
+    with django_db_blocker.unblock():
+        fill_catalogs()
+        call_command('generate_dataset', verbosity=0, **DATASET)
+
+
+@pytest.fixture
+def samples(db):
+    """Пользователь, автор, рецепт, тэг и ингредиент для запросов."""
+    return get_samples()
+
+
+@pytest.fixture
+def user_client(samples):
+    """Клиент API от имени пользователя с наибольшим числом подписок."""
+    return ProbeClient(samples.user)
@@ -0,0 +1,42 @@
+import pytest
+
+from recipes.admin_tools import EstimatedCountPaginator
+from recipes.models import Favorite, User
+
+pytestmark = pytest.mark.django_db
+
+ESTIMATE = 150
+
+
+@pytest.fixture
+def low_estimate(monkeypatch, settings):
+    """Оценка PostgreSQL сильно меньше настоящего числа строк."""
+    settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD = 0
+    monkeypatch.setattr('recipes.admin_tools.estimated_rows',
+                        lambda queryset: ESTIMATE)
+
+
+def test_low_estimate_does_not_cut_pages(low_estimate):
+    """Страницы за оценкой доступны, число страниц растет по выборке."""
+    paginator = EstimatedCountPaginator(Favorite.objects.order_by('pk'), 100)
+    assert paginator.count == ESTIMATE
+    assert paginator.num_pages == 2
+    page = paginator.page(10)
+    assert len(page.object_list) == 100
+    assert page.has_next()
+    assert paginator.num_pages == 11
+
+
+def test_filtered_list_is_counted_exactly(low_estimate):
+    """Список с фильтром считается точно, без оценки."""
+    queryset = Favorite.objects.filter(pk__gt=0)
+    paginator = EstimatedCountPaginator(queryset, 100)
+    assert paginator.count == queryset.count()
+
+
+def test_admin_reaches_rows_past_estimate(client, low_estimate):
+    """Админка открывает страницу, которой нет по оценке."""
+    client.force_login(User.objects.get(username='admin'))
+    response = client.get('/admin/recipes/favorite/', {'p': 40})
+    assert response.status_code == 200
+    assert len(response.context['cl'].result_list) == 100
@@ -0,0 +1,54 @@
+import io
+import json
+
+import pytest
+from PIL import Image
+
+from recipes.models import Ingredient, Recipe, Tag
+
+pytestmark = pytest.mark.django_db
+
+
+def image_file():
+    """Картинка рецепта как файл формы."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), (200, 120, 40)).save(buffer, 'PNG')
+    buffer.seek(0)
+    buffer.name = 'recipe.png'
+    return buffer
+
+
+def create_recipe(client, tags):
+    """Создает рецепт запросом multipart/form-data."""
+    ingredient = Ingredient.objects.first()
+    return client.post('/api/recipes/', {
+        'name': 'Рецепт из формы',
+        'text': 'Смешать.',
+        'cooking_time': 10,
+        'image': image_file(),
+        'tags': tags,
+        'ingredients': json.dumps([{'id': ingredient.pk, 'amount': 5}]),
+    }, format='multipart')
+
+
+@pytest.mark.parametrize('count', (1, 2, 3))
+def test_repeated_tag_fields(user_client, count):
+    """Тэги повторяемыми полями формы, в том числе один тэг."""
+    tag_ids = list(Tag.objects.values_list('pk', flat=True)[:count])
+    response = create_recipe(user_client, tag_ids)
+    assert response.status_code == 201, response.data
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    assert sorted(recipe.tags.values_list('pk', flat=True)) == sorted(tag_ids)
+
+
+def test_tags_as_json_string(user_client):
+    """Тэги одной строкой JSON, как их шлет фронтенд."""
+    tag_ids = list(Tag.objects.values_list('pk', flat=True)[:2])
+    response = create_recipe(user_client, json.dumps(tag_ids))
+    assert response.status_code == 201, response.data
+
+
+def test_broken_json_is_rejected(user_client):
+    """Испорченный JSON во вложенном поле дает 400."""
+    response = create_recipe(user_client, '[1, ')
+    assert response.status_code == 400
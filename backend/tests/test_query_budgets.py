@@ -0,0 +1,62 @@
+from urllib.parse import urlsplit
+
+import pytest
+from django.urls import resolve
+from rest_framework.utils.urls import replace_query_param
+
+from api.probes import endpoint_urls
+from api.querystats import assert_query_budget, track_queries
+from recipes.management.commands.check_query_budgets import PAGE_SIZES
+from recipes.models import Tag
+
+pytestmark = pytest.mark.django_db
+
+
+def url_name(url):
+    """Имя адреса для ключа QUERY_BUDGETS."""
+    return resolve(urlsplit(url).path).url_name
+
+
+@pytest.mark.parametrize('page_size', PAGE_SIZES)
+def test_endpoints_fit_query_budgets(samples, user_client, page_size):
+    """Основные адреса API укладываются в бюджеты запросов."""
+    failures = []
+    for url in endpoint_urls(samples):
+        page_url = replace_query_param(url, 'limit', page_size)
+        user_client.get(page_url)
+        try:
+            with assert_query_budget('GET', url_name(url)):
+                response = user_client.get(page_url)
+        except AssertionError as error:
+            failures.append(f'{page_url}: {error}')
+            continue
+        assert response.status_code < 500, page_url
+    assert not failures, '\n'.join(failures)
+
+
+def test_query_count_does_not_grow_with_page_size(samples, user_client):
+    """Число запросов не растет с размером страницы."""
+    for url in endpoint_urls(samples):
+        counts = []
+        for page_size in PAGE_SIZES:
+            page_url = replace_query_param(url, 'limit', page_size)
+            user_client.get(page_url)
+            with track_queries() as stats:
+                user_client.get(page_url)
+            counts.append(stats.count)
+        assert counts[-1] <= counts[0], f'{url}: {counts}'
+
+
+def test_assert_query_budget_names_most_repeated_sql():
+    """Превышение бюджета называет самый частый SQL."""
+    with pytest.raises(AssertionError, match='recipes_tag'):
+        with assert_query_budget('GET', 'tags-list', budget=1):
+            list(Tag.objects.all())
+            list(Tag.objects.all())
+
+
+def test_assert_query_budget_requires_budget():
+    """Адрес без бюджета в QUERY_BUDGETS - ошибка."""
+    with pytest.raises(AssertionError, match='не задан'):
+        with assert_query_budget('GET', 'no-such-url'):
+            pass
@@ -0,0 +1,42 @@
+import re
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+
+from api.queryplans import PlanAudit, exemption
+from recipes.models import Recipe
+
+pytestmark = pytest.mark.django_db
+
+
+def test_audit_command_passes():
+    """Основные адреса API читают большие таблицы по индексам."""
+    call_command('audit_query_plans', verbosity=0)
+
+
+def test_exemption_matches_table_and_sql(monkeypatch):
+    """Исключение срабатывает только для своей таблицы и своего SQL."""
+    monkeypatch.setattr('api.queryplans.SEQ_SCAN_EXEMPTIONS', (
+        ('recipes_recipe', re.compile(r'"tags_mask" & '), 'причина'),))
+    sql = str(Recipe.objects.with_tags(1).query)
+    assert exemption('recipes_recipe', sql) == 'причина'
+    assert exemption('recipes_recipe', str(Recipe.objects.all().query)) is None
+    assert exemption('recipes_favorite', sql) is None
+
+
+def test_unsupported_database_is_reported(monkeypatch):
+    """Для базы без разбора планов команда падает с понятной ошибкой."""
+    monkeypatch.setattr(connection, 'vendor', 'oracle')
+    with pytest.raises(CommandError, match='oracle'):
+        call_command('audit_query_plans', verbosity=0)
+
+
+@pytest.mark.skipif(connection.vendor != 'sqlite',
+                    reason='псевдонимы в плане пишет только SQLite')
+def test_sqlite_scan_of_aliased_subquery_is_found():
+    """Сканирование таблицы под псевдонимом U0 находится по имени."""
+    queryset = Recipe.objects.filter(pk__in=Recipe.objects.filter(
+        cooking_time__gt=5).values('pk'))
+    large, _ = PlanAudit().check(*queryset.query.sql_with_params())
+    assert large == ['recipes_recipe']
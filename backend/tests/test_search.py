@@ -0,0 +1,28 @@
+import pytest
+
+from recipes.models import Ingredient, Recipe, User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def recipe():
+    """Рецепт с кириллицей в названии и ингредиенте с буквой ё."""
+    recipe = Recipe.objects.create(
+        author=User.objects.first(), name='Соленые огурцы',
+        text='Залить рассолом.', cooking_time=30, image='recipes/x.jpg')
+    recipe.ingredients.add(
+        Ingredient.objects.create(name='Ёрш', measurement_unit='г'),
+        through_defaults={'amount': 1})
+    return recipe
+
+
+@pytest.mark.parametrize('text', ('соленые', 'СОЛЕНЫЕ', 'рассолом', 'ерш'))
+def test_search_ignores_case_and_yo(recipe, text):
+    """Поиск находит кириллицу в любом регистре, е и ё не различаются."""
+    assert recipe in Recipe.objects.search(text)
+
+
+def test_search_ranks_name_matches_first(recipe):
+    """Совпадение в названии идет раньше совпадения в тексте."""
+    assert Recipe.objects.search('соленые').first() == recipe
@@ -0,0 +1,26 @@
+import pytest
+
+pytestmark = pytest.mark.django_db
+
+URL = '/api/users/subscriptions/'
+
+
+def recipe_counts(client, **params):
+    """Число рецептов у каждого автора в выдаче подписок."""
+    response = client.get(URL, {'limit': 100, **params})
+    assert response.status_code == 200
+    return [len(author['recipes']) for author in response.data['results']]
+
+
+@pytest.mark.parametrize('limit', (0, 1, 2))
+def test_recipes_limit(user_client, limit):
+    """recipes_limit ограничивает рецепты автора, 0 - ни одного."""
+    counts = recipe_counts(user_client, recipes_limit=limit)
+    assert counts and max(counts) <= limit
+
+
+@pytest.mark.parametrize('value', ('', 'abc', '-1'))
+def test_invalid_recipes_limit_shows_all(user_client, value):
+    """Неверный recipes_limit не ограничивает рецепты."""
+    assert (recipe_counts(user_client, recipes_limit=value)
+            == recipe_counts(user_client))